@@ -0,0 +1,17 @@
+-- SmartPark AI: model versions on precomputed predictions
+-- For databases created from schema.sql before predictions and
+-- traffic_predictions had a model_version column; run once:
+--   mysql -u root -p smartpark_db < database/migrations/001_prediction_model_version.sql
+--
+-- ml-service/precompute.py tags the rows it writes with the model version,
+-- and training reads only predictions rows without one.
+
+USE smartpark_db;
+
+ALTER TABLE predictions
+    ADD COLUMN model_version INT AFTER confidence_score,
+    ADD INDEX idx_slot_time (slot_id, day_of_week, prediction_hour);
+
+ALTER TABLE traffic_predictions
+    ADD COLUMN model_version INT AFTER confidence_score,
+    ADD INDEX idx_zone_time (zone_id, day_of_week, prediction_hour);
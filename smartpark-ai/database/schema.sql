@@ -80,10 +80,12 @@ CREATE TABLE IF NOT EXISTS predictions (
     prediction_hour INT NOT NULL,
     day_of_week INT NOT NULL,
     confidence_score DECIMAL(5, 4),
+    model_version INT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (slot_id) REFERENCES parking_slots(id) ON DELETE CASCADE,
     INDEX idx_slot (slot_id),
-    INDEX idx_prediction_time (prediction_hour, day_of_week)
+    INDEX idx_prediction_time (prediction_hour, day_of_week),
+    INDEX idx_slot_time (slot_id, day_of_week, prediction_hour)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- User Activity Log
@@ -141,11 +143,13 @@ CREATE TABLE IF NOT EXISTS traffic_predictions (
     prediction_hour INT NOT NULL,
     day_of_week INT NOT NULL,
     confidence_score DECIMAL(5, 4),
+    model_version INT,
     prediction_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     valid_until TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (zone_id) REFERENCES traffic_zones(id) ON DELETE CASCADE,
     INDEX idx_zone (zone_id),
+    INDEX idx_zone_time (zone_id, day_of_week, prediction_hour),
     INDEX idx_location (latitude, longitude),
     INDEX idx_prediction_time (prediction_hour, day_of_week),
     INDEX idx_congestion (predicted_congestion),
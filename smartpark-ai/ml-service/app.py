@@ -1,107 +1,457 @@
-from flask import Flask, request, jsonify
+from startup import startup_profile
+from flask import Blueprint, Flask, Response, g, request, jsonify
 from flask_cors import CORS
+startup_profile.mark('import flask')
 import numpy as np
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
-import joblib
+startup_profile.mark('import numpy')
+import base64
+import json
 import os
+import threading
+import time
 from datetime import datetime
 
-app = Flask(__name__)
-CORS(app)
+from batching import MicroBatcher
+from compact_model import CompactModel
+from geo import ZoneIndex, load_zone_rows
+from jobs import JobRunner
+from metrics import (
+    BATCH_SIZE, CACHE_ENTRIES, CACHE_HITS, CACHE_MISSES, MODEL_LOAD_SECONDS, MODEL_VERSION,
+    REQUEST_SECONDS, REQUESTS, STAGE_SECONDS, TRAIN_SECONDS, StageClock, registry as metrics_registry
+)
+from history import REPORT_OCCUPANCY, TABLE_SIZE
+from intervals import occupancy_intervals
+from model_cache import ModelCache
+from model_registry import EMPTY_ROUTING, ModelRegistry, ModelSnapshot, routed_model_key
+from online import OnlineLearner, blend_occupancy, observation_arrays
+from response_cache import ResponseCache, make_backend
+from route_eta import estimate_routes, split_week_hour, week_hour
+from traffic_model import NOISE_MODES, predict_traffic_arrays
+startup_profile.mark('import service modules')
 
-# Global model variables
-model = None
-scaler = None
+api = Blueprint('api', __name__)
 
-def generate_sample_data():
-    """Generate sample parking occupancy data for training"""
-    np.random.seed(42)
-    
-    hours = []
-    days = []
-    occupancy = []
-    
-    # Generate data for a week (7 days, 24 hours)
-    for day in range(7):
-        for hour in range(24):
-            hours.append(hour)
-            days.append(day)
-            
-            # Peak hours (8-10 AM, 5-8 PM): 80-95% occupancy
-            if hour in [8, 9, 10, 17, 18, 19, 20]:
-                base_occupancy = 85 + np.random.normal(0, 5)
-            # Lunch hours (12-2 PM): 70-85% occupancy
-            elif hour in [12, 13, 14]:
-                base_occupancy = 75 + np.random.normal(0, 5)
-            # Night hours (10 PM - 6 AM): 20-40% occupancy
-            elif hour >= 22 or hour <= 6:
-                base_occupancy = 30 + np.random.normal(0, 5)
-            # Regular hours: 50-70% occupancy
-            else:
-                base_occupancy = 60 + np.random.normal(0, 5)
-            
-            # Weekend adjustment (Saturday=5, Sunday=6)
-            if day in [5, 6]:
-                base_occupancy *= 0.8  # 20% less on weekends
-            
-            # Ensure occupancy is between 0 and 100
-            occupancy.append(max(0, min(100, base_occupancy)))
+MODEL_DIR = os.environ.get('MODEL_DIR', 'models')
+
+# Currently served ModelSnapshot (model pipeline and lookup table published together)
+current_model = None
+publish_lock = threading.Lock()
+
+registry = ModelRegistry(MODEL_DIR)
+training_jobs = JobRunner(max_workers=1)
+
+# 'backtest' compares each retrain's recipe, refitted before each recent
+# rolling-origin fold, with the active version on reports that version never
+# saw, and keeps serving the active version if the new one's MAE is more than
+# PROMOTION_TOLERANCE (relative) worse; 'off' promotes every retrain
+PROMOTION_GATE = os.environ.get('PROMOTION_GATE', 'off')
+PROMOTION_TOLERANCE = float(os.environ.get('PROMOTION_TOLERANCE', 0.05))
+
+# Memory budget for slot/area-specific models held by each worker
+MODEL_CACHE_MB = float(os.environ.get('MODEL_CACHE_MB', 64))
+
+# Where traffic zones come from: 'seed' (database/seed_traffic_zones.sql), 'mysql', 'sqlite:<path>' or 'csv:<dir>'
+ZONES_SOURCE = os.environ.get('ZONES_SOURCE', 'seed')
+zone_index = ZoneIndex([])
+
+# Endpoint result cache: 'memory', 'sqlite:<path>' (shared by workers on the host), 'redis://...' or 'off'
+RESPONSE_CACHE = os.environ.get('RESPONSE_CACHE', 'memory')
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 4096))
+response_cache = ResponseCache(make_backend(RESPONSE_CACHE, RESPONSE_CACHE_SIZE))
+
+# 'eager' loads the model and zones while the app is created; 'background' loads
+# them on a thread so /health answers at once and /ready reports 503 until done
+MODEL_INIT = os.environ.get('MODEL_INIT', 'eager')
+init_state = {'status': 'pending', 'error': None}
+init_lock = threading.Lock()
+init_thread = None
+init_thread_lock = threading.Lock()
+
+# Endpoints that answer before the model is loaded
+NO_MODEL_ENDPOINTS = {'api.home', 'api.health', 'api.ready', 'api.prometheus_metrics', 'api.train_status'}
+
+# Longest horizon the streaming endpoint will produce (hours)
+MAX_STREAM_HOURS = int(os.environ.get('MAX_STREAM_HOURS', 24 * 90))
+
+# Coalesce concurrent single traffic predictions into one vectorized call
+# ('on' or 'off'); a batch is evaluated after MICRO_BATCH_WINDOW_MS or once
+# MICRO_BATCH_SIZE requests are waiting
+MICRO_BATCH = os.environ.get('MICRO_BATCH', 'off')
+MICRO_BATCH_WINDOW_MS = float(os.environ.get('MICRO_BATCH_WINDOW_MS', 2))
+MICRO_BATCH_SIZE = int(os.environ.get('MICRO_BATCH_SIZE', 64))
+
+# Largest zones x hours matrix /forecast/grid will compute
+MAX_GRID_CELLS = int(os.environ.get('MAX_GRID_CELLS', 1000000))
+
+# Largest search radius /zones/nearby accepts (km)
+MAX_NEARBY_RADIUS_KM = float(os.environ.get('MAX_NEARBY_RADIUS_KM', 100))
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+def publish_model(version, model, metadata, routing=None, activate=True):
+    """Build the snapshot for a fitted model and make it the one being served
+
+    activate=False only swaps what this process serves, for versions that are
+    already active in the registry (loading or refreshing); writing the index
+    again from a stale read could undo another process's /train or rollback.
+    """
+    global current_model
     
-    df = pd.DataFrame({
-        'hour': hours,
-        'day_of_week': days,
-        'occupancy': occupancy
-    })
+    routing = routing or EMPTY_ROUTING
+    snapshot = ModelSnapshot(
+        version=version,
+        model=model,
+        table=build_prediction_table(model),
+        metadata=metadata,
+        routing={
+            'slot_area': routing['slot_area'],
+            'zone_area': routing['zone_area'],
+            'models': {kind: set(keys) for kind, keys in routing['models'].items()}
+        }
+    )
+    with publish_lock:
+        if activate:
+            registry.activate(version)
+        current_model = snapshot
+        # Keyed models and cached results of the previous version are no longer reachable
+        model_cache.clear()
+        response_cache.clear()
+        online_learner.reset()
+    return snapshot
+
+def publish_observations(learner):
+    """Publish the served version again with live observations blended into its tables"""
+    global current_model
     
-    return df
+    with publish_lock:
+        snapshot = current_model
+        if snapshot is None:
+            return
+        current_model = snapshot._replace(
+            table=build_prediction_table(snapshot.model, learner.buckets()),
+            metadata={**snapshot.metadata, 'online_observations': learner.stats.rows_seen}
+        )
+        # Keyed tables are rebuilt with their own observations on next use
+        model_cache.clear()
+        response_cache.clear()
 
-def train_model():
-    """Train the parking occupancy prediction model"""
-    global model, scaler
+def train_model(source=None):
+    """Train the parking occupancy prediction model and publish it as a new version"""
+    # Imported on first use so serving-only workers never load scikit-learn or pandas
+    from training import fit_model
     
     print("🔄 Training parking prediction model...")
     
-    # Generate sample data
-    df = generate_sample_data()
+    start = time.perf_counter()
+    pipeline, metrics, keyed, routing = fit_model(source)
+    entry = registry.register(pipeline, metrics, keyed, routing)
     
-    # Features and target
-    X = df[['hour', 'day_of_week']]
-    y = df['occupancy']
+    if PROMOTION_GATE == 'backtest':
+        from backtest import gate
+        promoted, reason = gate(registry, entry['version'], source, PROMOTION_TOLERANCE)
+        entry = registry.get(entry['version'])
+        if not promoted:
+            TRAIN_SECONDS.observe(time.perf_counter() - start)
+            print(f"⚠️  Model version {entry['version']} not promoted: {reason}")
+            return entry
     
-    # Standardize features
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    publish_model(entry['version'], CompactModel.from_pipeline(pipeline), entry, routing)
+    TRAIN_SECONDS.observe(time.perf_counter() - start)
     
-    # Train model
-    model = LinearRegression()
-    model.fit(X_scaled, y)
-    
-    # Save model
-    os.makedirs('models', exist_ok=True)
-    joblib.dump(model, 'models/parking_model.pkl')
-    joblib.dump(scaler, 'models/scaler.pkl')
-    
-    print("✅ Model trained successfully!")
-    print(f"   Model score: {model.score(X_scaled, y):.4f}")
+    print(f"✅ Model trained successfully! (version {entry['version']}, {len(keyed)} slot/area models)")
+    print(f"   Model score: {metrics['score']:.4f}")
+    return entry
+
+def activate_version(version, activate=True):
+    """Load a registered version from disk and serve it (marking it active in the registry unless activate=False)"""
+    start = time.perf_counter()
+    model, metadata, routing = registry.load(version)
+    snapshot = publish_model(version, model, metadata, routing, activate)
+    MODEL_LOAD_SECONDS.observe(time.perf_counter() - start)
+    return snapshot
 
 def load_model():
-    """Load trained model from disk"""
-    global model, scaler
+    """Load the active model version from disk"""
+    version = registry.active_version()
+    if version is None:
+        # Workers booting together on an empty registry: the first one to get
+        # the lock creates version 1, the others wait and load it
+        with registry.first_version_lock():
+            version = registry.active_version()
+            if version is None:
+                create_first_version()
+                return
     
-    try:
-        model = joblib.load('models/parking_model.pkl')
-        scaler = joblib.load('models/scaler.pkl')
-        print("✅ Model loaded from disk")
-    except FileNotFoundError:
+    activate_version(version, activate=False)
+    print(f"✅ Model loaded from disk (version {version})")
+
+def create_first_version():
+    """Register the legacy artifacts, or train a new model, for an empty registry"""
+    # Import the unversioned artifacts from before the registry existed
+    legacy_files = [os.path.join(MODEL_DIR, name) for name in ('parking_model.pkl', 'scaler.pkl')]
+    if not all(os.path.exists(path) for path in legacy_files):
         print("⚠️  Model files not found, training new model...")
         train_model()
+        return
+    
+    import joblib
+    from features import legacy_pipeline
+    
+    pipeline = legacy_pipeline(*(joblib.load(path) for path in legacy_files))
+    entry = registry.register(pipeline, {'model_type': type(pipeline[-1]).__name__, 'source': 'legacy'})
+    publish_model(entry['version'], CompactModel.from_pipeline(pipeline), entry)
+    print(f"✅ Model loaded from disk (registered as version {entry['version']})")
+
+def load_keyed_model(cache_key):
+    """Loader for the model cache: read a slot/area model and build its lookup table"""
+    version, kind, key = cache_key
+    model, metadata, size = registry.load_keyed(version, kind, key)
+    snapshot = ModelSnapshot(
+        version=version,
+        model=model,
+        table=build_prediction_table(model, keyed_observations(version, kind, key)),
+        metadata=metadata
+    )
+    return snapshot, size
+
+def keyed_observations(version, kind, key):
+    """Live (count, sum) per bucket for a slot's or area's slots, if any were observed"""
+    served = current_model
+    if served is None or served.version != version or not online_learner.stats.rows_seen:
+        return None
+    if kind == 'slot':
+        slot_ids = [key]
+    else:
+        slot_ids = [slot_id for slot_id, area in served.routing['slot_area'].items() if area == key]
+    return online_learner.buckets(slot_ids)
+
+model_cache = ModelCache(load_keyed_model, int(MODEL_CACHE_MB * 1024 * 1024))
+
+# Live observations posted to /observe, applied by a background worker.
+# Statistics live in the process that received them, so 'on' needs a single
+# worker process and a per-process response cache; 'off' rejects /observe
+ONLINE_LEARNING = os.environ.get('ONLINE_LEARNING', 'off')
+if ONLINE_LEARNING == 'on' and response_cache.backend is not None and response_cache.backend.name != 'memory':
+    raise RuntimeError(
+        f'ONLINE_LEARNING=on needs RESPONSE_CACHE=memory or off: a shared {response_cache.backend.name} cache '
+        'would serve one process\'s blended predictions from every process'
+    )
+ONLINE_QUEUE_SIZE = int(os.environ.get('ONLINE_QUEUE_SIZE', 100000))
+ONLINE_PUBLISH_SECONDS = float(os.environ.get('ONLINE_PUBLISH_SECONDS', 60))
+# How many observations a bucket needs before they outweigh the model
+ONLINE_PRIOR_WEIGHT = float(os.environ.get('ONLINE_PRIOR_WEIGHT', 20))
+online_learner = OnlineLearner(publish_observations, ONLINE_QUEUE_SIZE, ONLINE_PUBLISH_SECONDS)
+
+def resolve_model_key(snapshot, slot_id=None, zone_id=None, area=None):
+    """Most specific (kind, key) with a trained model in the snapshot's version, or None for the city-wide model"""
+    return routed_model_key(snapshot.routing, slot_id, zone_id, area)
+
+def model_for_key(snapshot, model_key):
+    """Snapshot serving a resolved model key"""
+    if model_key is None:
+        return snapshot
+    return model_cache.get((snapshot.version,) + model_key)
+
+def model_key_label(model_key):
+    """Readable name of a resolved model key"""
+    return 'global' if model_key is None else f'{model_key[0]}:{model_key[1]}'
+
+def categorize_occupancy(occupancy):
+    """Map occupancy percentages to category and availability label arrays"""
+    conditions = [occupancy >= 90, occupancy >= 75, occupancy >= 50]
+    category = np.select(conditions, ['critical', 'high', 'medium'], default='low')
+    availability = np.select(conditions, ['very low', 'low', 'moderate'], default='high')
+    return category, availability
+
+def build_prediction_table(model, observed=None):
+    """Evaluate the model pipeline once for all 168 (day, hour) inputs
+
+    The table is indexed by day * 24 + hour. observed is an optional
+    (count, sum) pair of live observations per bucket to blend in.
+    """
+    clock = StageClock(STAGE_SECONDS, route='build_prediction_table')
+    days, hours = np.divmod(np.arange(TABLE_SIZE), 24)
+    inputs = np.column_stack((hours, days))
+    clock.mark('feature_build')
+    transformed = model.transform(inputs)
+    clock.mark('transform')
+    occupancy = np.clip(model.predict_transformed(transformed), 0, 100)
+    clock.mark('predict')
+    if observed is not None:
+        occupancy = blend_occupancy(occupancy, *observed, ONLINE_PRIOR_WEIGHT)
+    category, availability = categorize_occupancy(occupancy)
+    intervals = occupancy_intervals(occupancy, model.residual_scale)
+    
+    return {
+        'occupancy': np.round(occupancy, 2),
+        'available': np.round(100 - occupancy, 2),
+        'category': category,
+        'availability': availability,
+        'confidence': intervals['confidence'],
+        'p10': intervals['p10'],
+        'p50': intervals['p50'],
+        'p90': intervals['p90'],
+        'full_probability': intervals['full_probability']
+    }
+
+def table_index(hours, days):
+    """Position of (hour, day) pairs in the prediction table"""
+    return days * 24 + hours
+
+def validate_time_arrays(hours, days):
+    """Return an error message if any hour or day is out of range, else None"""
+    if hours.size and (hours.min() < 0 or hours.max() > 23):
+        return 'Hour must be between 0 and 23'
+    if days.size and (days.min() < 0 or days.max() > 6):
+        return 'Day must be between 0 (Monday) and 6 (Sunday)'
+    return None
+
+def wants_columnar(data=None):
+    """Check whether the caller asked for parallel arrays instead of row objects"""
+    fmt = request.args.get('format')
+    if fmt is None and isinstance(data, dict):
+        fmt = data.get('format')
+    return fmt == 'columnar'
+
+def format_predictions(columns, columnar):
+    """Shape a dict of equal-length columns as parallel arrays or a list of row dicts"""
+    if columnar:
+        return columns
+    keys = list(columns.keys())
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+def load_zones():
+    """Build the spatial index over traffic zones"""
+    global zone_index
+    
+    try:
+        zone_index = ZoneIndex(load_zone_rows(ZONES_SOURCE))
+        print(f"✅ Loaded {len(zone_index)} traffic zones from {ZONES_SOURCE}")
+    except Exception as e:
+        print(f"⚠️  Could not load traffic zones from {ZONES_SOURCE}: {e}")
+
+def resolve_zone_ids(lats, lngs, zone_ids):
+    """Keep given zone ids and fill the rest from the zone containing each coordinate"""
+    located = zone_index.locate_many(lats, lngs)
+    return [
+        zone_id if zone_id is not None else (int(found) if found >= 0 else None)
+        for zone_id, found in zip(zone_ids, located)
+    ]
+
+def zone_name(zone_id, default='Unknown Zone'):
+    """Name of an indexed zone"""
+    position = zone_index.positions.get(zone_id)
+    return zone_index.names[position] if position is not None else default
+
+def init_service():
+    """Load the model and traffic zones once per process"""
+    with init_lock:
+        if current_model is not None:
+            return
+        init_state['status'] = 'loading'
+        try:
+            with startup_profile.step('load model'):
+                load_model()
+            with startup_profile.step('load zones'):
+                load_zones()
+        except Exception as e:
+            init_state.update(status='failed', error=str(e))
+            print(f"⚠️  Service initialization failed: {e}")
+            raise
+        init_state.update(status='ready', error=None)
+    startup_profile.log()
 
-# Initialize model on startup
-load_model()
+def start_background_init():
+    """Run init_service on a daemon thread (once per process) so requests are answered meanwhile"""
+    global init_thread
+    
+    with init_thread_lock:
+        if current_model is not None or (init_thread is not None and init_thread.is_alive()):
+            return
+        init_thread = threading.Thread(target=init_in_background, name='service-init', daemon=True)
+        init_thread.start()
+
+def init_in_background():
+    try:
+        init_service()
+    except Exception:
+        # Already recorded in init_state and reported by /ready; the next request retries
+        pass
+
+def refresh_model():
+    """Serve the registry's active version if another process changed it; returns True on change"""
+    version = registry.active_version()
+    if version is None or (current_model is not None and current_model.version == version):
+        return False
+    activate_version(version, activate=False)
+    return True
+
+def create_app(preload=None):
+    """Create the Flask application
+
+    The model and zones are loaded as MODEL_INIT says unless preload is given:
+    True loads them before returning, False leaves it to the first request.
+    """
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(api)
+    startup_profile.mark('create app')
+    
+    if preload is None:
+        preload = MODEL_INIT != 'background'
+        if not preload:
+            start_background_init()
+    if preload:
+        init_service()
+    
+    return app
+
+def route_label():
+    """Route template of the current request, so metrics don't get one series per URL"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def stage_clock():
+    """StageClock for timing the stages of the current request"""
+    return StageClock(STAGE_SECONDS, route=route_label())
+
+@api.before_app_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@api.before_app_request
+def require_model():
+    """Answer 503 instead of failing while the model is still loading"""
+    if current_model is None and request.endpoint is not None and request.endpoint not in NO_MODEL_ENDPOINTS:
+        start_background_init()
+        return jsonify({
+            'success': False,
+            'error': 'Model is not loaded yet',
+            'status': init_state['status']
+        }), 503
+
+@api.after_app_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = route_label()
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=request.method)
+        REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    return response
 
-@app.route('/')
+@metrics_registry.collector
+def collect_service_metrics():
+    """Refresh model and cache gauges before each scrape"""
+    snapshot = current_model
+    if snapshot is not None:
+        MODEL_VERSION.set(snapshot.version)
+    for name, stats in (('model', model_cache.stats()), ('response', response_cache.stats())):
+        if 'hits' in stats:
+            CACHE_HITS.set_total(stats['hits'], cache=name)
+            CACHE_MISSES.set_total(stats['misses'], cache=name)
+        if stats.get('entries') is not None:
+            CACHE_ENTRIES.set(stats['entries'], cache=name)
+
+@api.route('/')
 def home():
     """API home endpoint"""
     return jsonify({
@@ -109,83 +459,138 @@ def home():
         'message': 'SmartPark AI - ML Prediction Service',
         'version': '1.0.0',
         'endpoints': {
-            '/predict': 'GET - Predict parking occupancy',
+            '/predict': 'GET - Predict parking occupancy (optional slot_id, zone_id or area)',
             '/predict/batch': 'POST - Batch predictions',
-            '/train': 'POST - Retrain model',
-            '/health': 'GET - Health check'
+            '/forecast/grid': 'GET/POST - Zones x hours occupancy and congestion matrices',
+            '/predict/stream': 'GET/POST - Stream long-horizon forecasts as NDJSON or SSE',
+            '/predict/traffic/route': 'POST - Travel time and traffic along one or more routes',
+            '/observe': 'POST - Live occupancy observations for incremental updates',
+            '/train': 'POST - Retrain model in the background',
+            '/train/status/<job_id>': 'GET - Training job status',
+            '/model/versions': 'GET - Registered model versions',
+            '/model/rollback': 'POST - Serve a previous model version',
+            '/zones/nearby': 'GET - Traffic zones near a point (lat, lng, radius km)',
+            '/zones/bbox': 'GET - Traffic zones in a map viewport',
+            '/zones/locate': 'GET - Traffic zones containing a point',
+            '/metrics': 'GET - Prometheus metrics',
+            '/health': 'GET - Health check (liveness)',
+            '/ready': 'GET - Readiness check, 503 until the model is loaded'
         }
     })
 
-@app.route('/health')
+@api.route('/health')
 def health():
     """Health check endpoint"""
     return jsonify({
         'success': True,
         'status': 'healthy',
-        'model_loaded': model is not None,
+        'model_loaded': current_model is not None,
+        'model_version': current_model.version if current_model else None,
         'timestamp': datetime.now().isoformat()
     })
 
-@app.route('/predict', methods=['GET'])
+@api.route('/ready')
+def ready():
+    """Readiness probe: 200 once the model and zones are loaded, 503 before"""
+    snapshot = current_model
+    is_ready = snapshot is not None
+    return jsonify({
+        'success': is_ready,
+        'status': 'ready' if is_ready else init_state['status'],
+        'error': init_state['error'],
+        'model_version': snapshot.version if snapshot else None,
+        'startup': startup_profile.report()
+    }), 200 if is_ready else 503
+
+@api.route('/metrics')
+def prometheus_metrics():
+    """Prometheus metrics for this worker"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+def query_value(args, name, type, default=None):
+    """Query parameter converted with `type`; missing or unparsable values give the default"""
+    value = args.get(name)
+    if value is None:
+        return default
+    try:
+        return type(value)
+    except (TypeError, ValueError):
+        return default
+
+def int_param(value, name):
+    """Integer request parameter; raises ValueError naming the parameter if it is not one"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an integer') from None
+
+def parse_predict_args(args):
+    """(hour, day, slot_id, zone_id, area) for /predict; raises ValueError for out-of-range times"""
+    now = datetime.now()
+    hour = query_value(args, 'hour', int, now.hour)
+    day = query_value(args, 'day', int, now.weekday())
+    error = validate_time_arrays(np.array([hour]), np.array([day]))
+    if error:
+        raise ValueError(error)
+    return hour, day, query_value(args, 'slot_id', int), query_value(args, 'zone_id', int), args.get('area')
+
+def occupancy_cache_params(snapshot, hour, day, slot_id=None, zone_id=None, area=None):
+    """(model key, response cache parameters) for a /predict call"""
+    model_key = resolve_model_key(snapshot, slot_id, zone_id, area)
+    return model_key, {'hour': hour, 'day': day, 'model': model_key_label(model_key)}
+
+def build_occupancy_prediction(snapshot, model_key, hour, day):
+    """/predict result (without timestamp) from a model key's table; may load a keyed model from disk"""
+    table = model_for_key(snapshot, model_key).table
+    index = table_index(hour, day)
+    return {
+        'occupancy_percentage': float(table['occupancy'][index]),
+        'available_percentage': float(table['available'][index]),
+        'category': str(table['category'][index]),
+        'availability': str(table['availability'][index]),
+        'confidence_score': float(table['confidence'][index]),
+        'occupancy_p10': float(table['p10'][index]),
+        'occupancy_p50': float(table['p50'][index]),
+        'occupancy_p90': float(table['p90'][index]),
+        'full_probability': float(table['full_probability'][index]),
+        'hour': hour,
+        'day_of_week': day,
+        'day_name': DAY_NAMES[day],
+        'model': model_key_label(model_key),
+        'model_version': snapshot.version
+    }
+
+def occupancy_prediction(snapshot, hour, day, slot_id=None, zone_id=None, area=None):
+    """Cached /predict result (without timestamp) from the most specific model's table"""
+    model_key, params = occupancy_cache_params(snapshot, hour, day, slot_id, zone_id, area)
+    return response_cache.get_or_build(
+        'predict', snapshot.version, params, lambda: build_occupancy_prediction(snapshot, model_key, hour, day)
+    )
+
+@api.route('/predict', methods=['GET'])
 def predict():
-    """Predict parking occupancy for given hour and day"""
+    """Predict parking occupancy for given hour and day (optionally for a slot, zone or area)"""
     try:
-        # Get parameters
-        hour = request.args.get('hour', type=int, default=datetime.now().hour)
-        day = request.args.get('day', type=int, default=datetime.now().weekday())
-        
-        # Validate inputs
-        if not (0 <= hour <= 23):
+        clock = stage_clock()
+        try:
+            hour, day, slot_id, zone_id, area = parse_predict_args(request.args)
+        except ValueError as e:
             return jsonify({
                 'success': False,
-                'error': 'Hour must be between 0 and 23'
+                'error': str(e)
             }), 400
+        clock.mark('parse')
         
-        if not (0 <= day <= 6):
-            return jsonify({
-                'success': False,
-                'error': 'Day must be between 0 (Monday) and 6 (Sunday)'
-            }), 400
+        # Look up the precomputed prediction of the most specific model
+        prediction = occupancy_prediction(current_model, hour, day, slot_id, zone_id, area)
+        clock.mark('predict')
         
-        # Prepare features
-        features = np.array([[hour, day]])
-        features_scaled = scaler.transform(features)
-        
-        # Make prediction
-        prediction = model.predict(features_scaled)[0]
-        prediction = max(0, min(100, prediction))  # Clip to 0-100
-        
-        # Calculate confidence score (inverse of distance from training data mean)
-        confidence = 0.90 if 8 <= hour <= 20 else 0.85
-        
-        # Get category
-        if prediction >= 90:
-            category = 'critical'
-            availability = 'very low'
-        elif prediction >= 75:
-            category = 'high'
-            availability = 'low'
-        elif prediction >= 50:
-            category = 'medium'
-            availability = 'moderate'
-        else:
-            category = 'low'
-            availability = 'high'
-        
-        return jsonify({
+        response = jsonify({
             'success': True,
-            'prediction': {
-                'occupancy_percentage': round(prediction, 2),
-                'available_percentage': round(100 - prediction, 2),
-                'category': category,
-                'availability': availability,
-                'confidence_score': confidence,
-                'hour': hour,
-                'day_of_week': day,
-                'day_name': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'][day],
-                'timestamp': datetime.now().isoformat()
-            }
+            'prediction': {**prediction, 'timestamp': datetime.now().isoformat()}
         })
+        clock.mark('serialize')
+        return response
     
     except Exception as e:
         return jsonify({
@@ -193,10 +598,11 @@ def predict():
             'error': str(e)
         }), 500
 
-@app.route('/predict/batch', methods=['POST'])
+@api.route('/predict/batch', methods=['POST'])
 def predict_batch():
     """Batch predictions for multiple time slots"""
     try:
+        clock = stage_clock()
         data = request.get_json()
         
         if not data or 'requests' not in data:
@@ -205,32 +611,66 @@ def predict_batch():
                 'error': 'Invalid request format. Expected {"requests": [{"hour": 0, "day": 0}, ...]}'
             }), 400
         
-        predictions = []
+        now = datetime.now()
+        requests_list = data['requests']
+        hours = np.array([req.get('hour', now.hour) for req in requests_list], dtype=int)
+        days = np.array([req.get('day', now.weekday()) for req in requests_list], dtype=int)
         
-        for req in data['requests']:
-            hour = req.get('hour', datetime.now().hour)
-            day = req.get('day', datetime.now().weekday())
-            
-            # Prepare features
-            features = np.array([[hour, day]])
-            features_scaled = scaler.transform(features)
-            
-            # Make prediction
-            prediction = model.predict(features_scaled)[0]
-            prediction = max(0, min(100, prediction))
-            
-            predictions.append({
-                'hour': hour,
-                'day_of_week': day,
-                'occupancy_percentage': round(prediction, 2),
-                'available_percentage': round(100 - prediction, 2)
-            })
+        error = validate_time_arrays(hours, days)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
         
-        return jsonify({
+        BATCH_SIZE.observe(len(requests_list), route=route_label())
+        clock.mark('parse')
+        
+        # Group entries by the model that serves them, then gather each
+        # group's rows from that model's table in one indexing pass
+        snapshot = current_model
+        groups = {}
+        for i, req in enumerate(requests_list):
+            model_key = resolve_model_key(snapshot, req.get('slot_id'), req.get('zone_id'), req.get('area'))
+            groups.setdefault(model_key, []).append(i)
+        clock.mark('feature_build')
+        
+        index = table_index(hours, days)
+        fields = ('occupancy', 'available', 'p10', 'p50', 'p90', 'full_probability')
+        values = {field: np.empty(len(requests_list)) for field in fields}
+        for model_key, positions in groups.items():
+            table = model_for_key(snapshot, model_key).table
+            positions = np.array(positions)
+            for field in fields:
+                values[field][positions] = table[field][index[positions]]
+        
+        columns = {
+            'hour': hours.tolist(),
+            'day_of_week': days.tolist(),
+            'occupancy_percentage': values['occupancy'].tolist(),
+            'available_percentage': values['available'].tolist(),
+            'occupancy_p10': values['p10'].tolist(),
+            'occupancy_p50': values['p50'].tolist(),
+            'occupancy_p90': values['p90'].tolist(),
+            'full_probability': values['full_probability'].tolist()
+        }
+        # Only report which model answered when callers asked for specific ones
+        if len(groups) > 1 or None not in groups:
+            labels = np.empty(len(requests_list), dtype=object)
+            for model_key, positions in groups.items():
+                labels[positions] = model_key_label(model_key)
+            columns['model'] = labels.tolist()
+        clock.mark('predict')
+        
+        predictions = format_predictions(columns, wants_columnar(data))
+        
+        response = jsonify({
             'success': True,
-            'count': len(predictions),
+            'count': len(requests_list),
             'predictions': predictions
         })
+        clock.mark('serialize')
+        return response
     
     except Exception as e:
         return jsonify({
@@ -238,10 +678,11 @@ def predict_batch():
             'error': str(e)
         }), 500
 
-@app.route('/predict/next-hours', methods=['GET'])
+@api.route('/predict/next-hours', methods=['GET'])
 def predict_next_hours():
     """Predict parking occupancy for the next N hours"""
     try:
+        clock = stage_clock()
         hours = request.args.get('hours', type=int, default=6)
         
         if not (1 <= hours <= 24):
@@ -250,38 +691,377 @@ def predict_next_hours():
                 'error': 'Hours must be between 1 and 24'
             }), 400
         
-        current_hour = datetime.now().hour
-        current_day = datetime.now().weekday()
+        now = datetime.now()
+        snapshot = current_model
+        columnar = wants_columnar()
+        clock.mark('parse')
+        
+        def build():
+            offsets = np.arange(hours)
+            absolute_hours = now.hour + offsets
+            hour_values = absolute_hours % 24
+            day_values = (now.weekday() + absolute_hours // 24) % 7
+            
+            table = snapshot.table
+            index = table_index(hour_values, day_values)
+            
+            return format_predictions({
+                'hour': hour_values.tolist(),
+                'day_of_week': day_values.tolist(),
+                'occupancy_percentage': table['occupancy'][index].tolist(),
+                'available_percentage': table['available'][index].tolist(),
+                'occupancy_p10': table['p10'][index].tolist(),
+                'occupancy_p50': table['p50'][index].tolist(),
+                'occupancy_p90': table['p90'][index].tolist(),
+                'full_probability': table['full_probability'][index].tolist(),
+                'hours_from_now': offsets.tolist()
+            }, columnar)
         
-        predictions = []
+        params = {'hours': hours, 'hour': now.hour, 'day': now.weekday(), 'columnar': columnar}
+        predictions = response_cache.get_or_build('next-hours', snapshot.version, params, build)
+        clock.mark('predict')
+        
+        response = jsonify({
+            'success': True,
+            'count': hours,
+            'predictions': predictions,
+            'current_time': now.isoformat()
+        })
+        clock.mark('serialize')
+        return response
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def parse_id_list(value, name='ids'):
+    """Ids from a comma-separated string or a JSON list; 'all' is passed through"""
+    if value is None or value == 'all':
+        return value
+    if isinstance(value, str):
+        value = [item for item in value.split(',') if item.strip()]
+    try:
+        return [int(item) for item in value]
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a list of integer ids') from None
+
+def known_zone_ids(value):
+    """Zone ids from a zone_ids parameter ('all' for every indexed zone); raises ValueError for unknown ids"""
+    zone_ids = parse_id_list(value, 'zone_ids')
+    if zone_ids == 'all':
+        return zone_index.ids.tolist()
+    unknown = [zone_id for zone_id in zone_ids or [] if zone_id not in zone_index.positions]
+    if unknown:
+        raise ValueError(f'Unknown zone ids: {unknown[:20]}')
+    return zone_ids
+
+def iter_forecast_blocks(snapshot, targets, start, hours, block_size):
+    """Yield dicts of column arrays covering `hours` hours from `start` for each target
+
+    targets is a list of (kind, id) with kind 'slot', 'zone' or 'global'. Only
+    one block of at most block_size rows is materialized at a time.
+    """
+    for kind, target_id in targets:
+        slot_id = target_id if kind == 'slot' else None
+        zone_id = target_id if kind == 'zone' else None
+        model_key = resolve_model_key(snapshot, slot_id, zone_id)
+        table = model_for_key(snapshot, model_key).table
+        label = model_key_label(model_key)
+        position = zone_index.positions.get(zone_id) if zone_id is not None else None
         
-        for i in range(hours):
-            hour = (current_hour + i) % 24
-            day = current_day + ((current_hour + i) // 24)
-            day = day % 7
+        for block_start in range(0, hours, block_size):
+            offsets = np.arange(block_start, min(block_start + block_size, hours))
+            absolute_hours = start.hour + offsets
+            hour_values = absolute_hours % 24
+            day_values = (start.weekday() + absolute_hours // 24) % 7
+            index = table_index(hour_values, day_values)
+            forecast_times = np.datetime64(start, 'h') + offsets.astype('timedelta64[h]')
             
-            # Prepare features
-            features = np.array([[hour, day]])
-            features_scaled = scaler.transform(features)
+            columns = {
+                'hours_from_now': offsets.tolist(),
+                'forecast_time': np.datetime_as_string(forecast_times, unit='m').tolist(),
+                'hour': hour_values.tolist(),
+                'day_of_week': day_values.tolist(),
+                'occupancy_percentage': table['occupancy'][index].tolist(),
+                'available_percentage': table['available'][index].tolist(),
+                'occupancy_p10': table['p10'][index].tolist(),
+                'occupancy_p50': table['p50'][index].tolist(),
+                'occupancy_p90': table['p90'][index].tolist(),
+                'full_probability': table['full_probability'][index].tolist()
+            }
             
-            # Make prediction
-            prediction = model.predict(features_scaled)[0]
-            prediction = max(0, min(100, prediction))
+            if kind == 'zone':
+                lat = zone_index.lats[position] if position is not None else None
+                lng = zone_index.lngs[position] if position is not None else None
+                traffic = predict_traffic_arrays(hour_values, day_values, lat, lng, zone_id)
+                columns['congestion_level'] = traffic['level'].tolist()
+                columns['congestion_percentage'] = np.round(traffic['congestion'], 2).tolist()
+                columns['avg_speed_kmh'] = np.round(traffic['speed'], 2).tolist()
             
-            predictions.append({
-                'hour': hour,
-                'day_of_week': day,
-                'occupancy_percentage': round(prediction, 2),
-                'available_percentage': round(100 - prediction, 2),
-                'hours_from_now': i
-            })
+            yield kind, target_id, label, columns
+
+def stream_forecast(blocks, fmt):
+    """Serialize forecast blocks as NDJSON lines or Server-Sent Events, one chunk per block"""
+    count = 0
+    for kind, target_id, label, columns in blocks:
+        rows = format_predictions(columns, False)
+        lines = []
+        for row in rows:
+            if kind != 'global':
+                row[f'{kind}_id'] = target_id
+            row['model'] = label
+            payload = json.dumps(row, separators=(',', ':'))
+            lines.append(f'event: prediction\ndata: {payload}\n\n' if fmt == 'sse' else payload + '\n')
+        count += len(rows)
+        yield ''.join(lines)
+    
+    if fmt == 'sse':
+        yield f'event: end\ndata: {json.dumps({"count": count})}\n\n'
+
+@api.route('/predict/stream', methods=['GET', 'POST'])
+def predict_stream():
+    """Stream occupancy (and, for zones, traffic) forecasts as NDJSON or Server-Sent Events"""
+    try:
+        data = request.get_json(silent=True) if request.method == 'POST' else None
+        data = data if isinstance(data, dict) else {}
+        
+        def param(name, default=None):
+            return data.get(name, request.args.get(name, default))
+        
+        fmt = param('format', 'ndjson')
+        try:
+            hours = int_param(param('hours', 24), 'hours')
+            block_size = int_param(param('chunk_size', 500), 'chunk_size')
+            slot_ids = parse_id_list(param('slot_ids'), 'slot_ids')
+            zone_ids = known_zone_ids(param('zone_ids'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        if not (1 <= hours <= MAX_STREAM_HOURS):
+            return jsonify({
+                'success': False,
+                'error': f'Hours must be between 1 and {MAX_STREAM_HOURS}'
+            }), 400
+        
+        if fmt not in ('ndjson', 'sse'):
+            return jsonify({
+                'success': False,
+                'error': 'format must be ndjson or sse'
+            }), 400
+        
+        if not (1 <= block_size <= 10000):
+            return jsonify({
+                'success': False,
+                'error': 'chunk_size must be between 1 and 10000'
+            }), 400
+        
+        if slot_ids == 'all':
+            return jsonify({
+                'success': False,
+                'error': 'slot_ids must list slot ids'
+            }), 400
+        
+        targets = [('slot', slot_id) for slot_id in slot_ids or []] + [('zone', zone_id) for zone_id in zone_ids or []]
+        if not targets:
+            targets = [('global', None)]
+        
+        # Pin the model and start time so the whole stream is consistent
+        snapshot = current_model
+        start = datetime.now().replace(minute=0, second=0, microsecond=0)
+        blocks = iter_forecast_blocks(snapshot, targets, start, hours, block_size)
         
+        mimetype = 'text/event-stream' if fmt == 'sse' else 'application/x-ndjson'
+        return Response(stream_forecast(blocks, fmt), mimetype=mimetype, headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+            'X-Model-Version': str(snapshot.version)
+        })
+    
+    except Exception as e:
         return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def forecast_grid_arrays(snapshot, zone_ids, start, hours, noise='hashed', seed=None):
+    """Occupancy and congestion as (zones, hours) matrices for consecutive hours from `start`
+
+    Zones share one prediction table per model key, so occupancy is a single
+    fancy-indexing lookup; traffic is predicted for all cells in one call.
+    """
+    absolute_hours = start.hour + np.arange(hours)
+    hour_values = absolute_hours % 24
+    day_values = (start.weekday() + absolute_hours // 24) % 7
+    index = table_index(hour_values, day_values)
+    
+    model_keys = [resolve_model_key(snapshot, zone_id=zone_id) for zone_id in zone_ids]
+    unique_keys = list(dict.fromkeys(model_keys))
+    tables = np.array([model_for_key(snapshot, model_key).table['occupancy'] for model_key in unique_keys])
+    rows = np.array([unique_keys.index(model_key) for model_key in model_keys], dtype=np.int64)
+    occupancy = tables[rows[:, None], index[None, :]]
+    
+    positions = np.array([zone_index.positions[zone_id] for zone_id in zone_ids], dtype=np.int64)
+    cells = (len(zone_ids), hours)
+    traffic = predict_traffic_arrays(
+        np.broadcast_to(hour_values, cells).ravel(),
+        np.broadcast_to(day_values, cells).ravel(),
+        np.repeat(zone_index.lats[positions], hours),
+        np.repeat(zone_index.lngs[positions], hours),
+        np.repeat(np.asarray(zone_ids, dtype=float), hours),
+        noise, seed
+    )
+    return {
+        'hour': hour_values,
+        'day_of_week': day_values,
+        'models': [model_key_label(model_key) for model_key in model_keys],
+        'occupancy': occupancy,
+        'congestion': traffic['congestion'].reshape(cells),
+        'speed': traffic['speed'].reshape(cells)
+    }
+
+def encode_matrix(matrix, encoding):
+    """A matrix as nested JSON lists, or as base64 of its little-endian float32 bytes (row-major)"""
+    if encoding == 'base64':
+        return {
+            'dtype': 'float32',
+            'shape': list(matrix.shape),
+            'data': base64.b64encode(np.ascontiguousarray(matrix, dtype='<f4').tobytes()).decode('ascii')
+        }
+    return np.round(matrix, 2).tolist()
+
+@api.route('/forecast/grid', methods=['GET', 'POST'])
+def forecast_grid():
+    """Occupancy and congestion for many zones over the next hours as dense zones x hours matrices"""
+    try:
+        clock = stage_clock()
+        data = request.get_json(silent=True) if request.method == 'POST' else None
+        data = data if isinstance(data, dict) else {}
+        
+        def param(name, default=None):
+            return data.get(name, request.args.get(name, default))
+        
+        encoding = param('encoding', 'json')
+        try:
+            hours = int_param(param('hours', 24), 'hours')
+            zone_ids = known_zone_ids(param('zone_ids', 'all'))
+            noise, seed = traffic_noise_options(data)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        if not zone_ids:
+            return jsonify({
+                'success': False,
+                'error': 'No zones to forecast: zone_ids is empty or no zones are loaded'
+            }), 400
+        
+        if not (1 <= hours <= MAX_STREAM_HOURS):
+            return jsonify({
+                'success': False,
+                'error': f'Hours must be between 1 and {MAX_STREAM_HOURS}'
+            }), 400
+        
+        if encoding not in ('json', 'base64'):
+            return jsonify({
+                'success': False,
+                'error': 'encoding must be json or base64'
+            }), 400
+        
+        if noise not in NOISE_MODES:
+            return jsonify({
+                'success': False,
+                'error': f"noise must be one of {', '.join(NOISE_MODES)}"
+            }), 400
+        
+        if len(zone_ids) * hours > MAX_GRID_CELLS:
+            return jsonify({
+                'success': False,
+                'error': f'Grid too large: at most {MAX_GRID_CELLS} zone-hours per request'
+            }), 400
+        BATCH_SIZE.observe(len(zone_ids) * hours, route=route_label())
+        clock.mark('parse')
+        
+        snapshot = current_model
+        start = datetime.now().replace(minute=0, second=0, microsecond=0)
+        grid = forecast_grid_arrays(snapshot, zone_ids, start, hours, noise, seed)
+        clock.mark('predict')
+        
+        forecast_times = np.datetime64(start, 'h') + np.arange(hours).astype('timedelta64[h]')
+        response = jsonify({
             'success': True,
-            'count': len(predictions),
-            'predictions': predictions,
-            'current_time': datetime.now().isoformat()
+            'model_version': snapshot.version,
+            'start': start.isoformat(),
+            'encoding': encoding,
+            'zone_ids': zone_ids,
+            'zone_names': [zone_name(zone_id) for zone_id in zone_ids],
+            'models': grid['models'],
+            'forecast_time': np.datetime_as_string(forecast_times, unit='m').tolist(),
+            'hour': grid['hour'].tolist(),
+            'day_of_week': grid['day_of_week'].tolist(),
+            'occupancy_percentage': encode_matrix(grid['occupancy'], encoding),
+            'congestion_percentage': encode_matrix(grid['congestion'], encoding),
+            'avg_speed_kmh': encode_matrix(grid['speed'], encoding)
         })
+        clock.mark('serialize')
+        return response
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/observe', methods=['POST'])
+def observe():
+    """Queue live occupancy observations (one object or {"observations": [...]}) for incremental updates"""
+    try:
+        if ONLINE_LEARNING != 'on':
+            return jsonify({
+                'success': False,
+                'error': 'Online learning is disabled (set ONLINE_LEARNING=on with a single worker)'
+            }), 503
+        
+        data = request.get_json()
+        
+        if not isinstance(data, dict):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid request format. Expected an observation or {"observations": [...]}'
+            }), 400
+        
+        observations = data['observations'] if 'observations' in data else [data]
+        if not isinstance(observations, list):
+            return jsonify({
+                'success': False,
+                'error': 'observations must be a list'
+            }), 400
+        arrays, rejected = observation_arrays(observations, datetime.now(), REPORT_OCCUPANCY)
+        BATCH_SIZE.observe(len(observations), route=route_label())
+        
+        if len(arrays[3]) and not online_learner.submit(*arrays):
+            return jsonify({
+                'success': False,
+                'error': 'Observation queue is full, retry later',
+                'online': online_learner.status()
+            }), 429
+        
+        # Callers that need the updated predictions right away can opt in to waiting
+        if request.args.get('wait', 'false').lower() == 'true':
+            online_learner.flush()
+        
+        return jsonify({
+            'success': True,
+            'accepted': len(arrays[3]),
+            'rejected': rejected,
+            'online': online_learner.status()
+        }), 202
     
     except Exception as e:
         return jsonify({
@@ -289,14 +1069,106 @@ def predict_next_hours():
             'error': str(e)
         }), 500
 
-@app.route('/train', methods=['POST'])
+@api.route('/train', methods=['POST'])
 def retrain():
-    """Retrain the model (admin endpoint)"""
+    """Retrain the model in the background (admin endpoint)"""
     try:
-        train_model()
+        job_id = training_jobs.submit('train', train_model)
+        
+        # Callers that need the new version before continuing can opt in to blocking
+        if request.args.get('wait', 'false').lower() == 'true':
+            job = training_jobs.wait(job_id)
+            if job['status'] == 'failed':
+                return jsonify({
+                    'success': False,
+                    'error': job['error'],
+                    'job': job
+                }), 500
+            promotion = (job['result'] or {}).get('promotion') or {'promoted': True}
+            return jsonify({
+                'success': True,
+                'message': 'Model retrained successfully' if promotion['promoted'] else 'Model retrained but not promoted',
+                'job': job
+            })
+        
+        return jsonify({
+            'success': True,
+            'message': 'Model retraining started',
+            'job_id': job_id,
+            'status_url': f'/train/status/{job_id}'
+        }), 202
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/train/status/<job_id>')
+def train_status(job_id):
+    """Get the status of a background training job"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': f'Unknown job: {job_id}'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job
+    })
+
+@api.route('/model/versions')
+def model_versions():
+    """List registered model versions"""
+    try:
+        versions, active = registry.versions()
+        return jsonify({
+            'success': True,
+            'active_version': active,
+            'serving_version': current_model.version if current_model else None,
+            'count': len(versions),
+            'versions': versions
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/model/rollback', methods=['POST'])
+def model_rollback():
+    """Serve a previously registered model version (defaults to the one before the active version)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        version = data.get('version', registry.previous_version())
+        
+        if version is None:
+            return jsonify({
+                'success': False,
+                'error': 'No previous model version to roll back to'
+            }), 400
+        
+        try:
+            version = int_param(version, 'version')
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        if registry.get(version) is None:
+            return jsonify({
+                'success': False,
+                'error': f'Unknown model version: {version}'
+            }), 404
+        
+        snapshot = activate_version(version)
+        
         return jsonify({
             'success': True,
-            'message': 'Model retrained successfully'
+            'message': f'Now serving model version {snapshot.version}',
+            'model': snapshot.metadata
         })
     except Exception as e:
         return jsonify({
@@ -304,18 +1176,27 @@ def retrain():
             'error': str(e)
         }), 500
 
-@app.route('/model/info')
+@api.route('/model/info')
 def model_info():
     """Get model information"""
     try:
+        snapshot = current_model
         return jsonify({
             'success': True,
             'model': {
-                'type': 'Linear Regression',
-                'features': ['hour', 'day_of_week'],
+                'type': snapshot.metadata.get('model_type') if snapshot else None,
+                'inputs': ['hour', 'day_of_week'],
+                'features': snapshot.model.feature_names if snapshot else None,
+                'pipeline': snapshot.model.steps if snapshot else None,
                 'target': 'occupancy_percentage',
-                'trained': model is not None,
-                'scaler': 'StandardScaler'
+                'trained': snapshot is not None,
+                'version': snapshot.version if snapshot else None,
+                'metadata': snapshot.metadata if snapshot else None,
+                'keyed_models': {kind: len(keys) for kind, keys in snapshot.routing['models'].items()} if snapshot else None,
+                'model_cache': model_cache.stats(),
+                'response_cache': response_cache.stats(),
+                'online': online_learner.status(),
+                'micro_batching': traffic_batcher.stats() if traffic_batcher is not None else None
             }
         })
     except Exception as e:
@@ -324,94 +1205,134 @@ def model_info():
             'error': str(e)
         }), 500
 
-@app.route('/predict/traffic', methods=['GET'])
+def traffic_noise_options(data=None):
+    """Noise mode and seed for the traffic model from query args or a JSON body"""
+    data = data if isinstance(data, dict) else {}
+    noise = request.args.get('noise', data.get('noise', 'hashed'))
+    seed = request.args.get('seed', data.get('seed'))
+    return noise, int_param(seed, 'seed') if seed is not None else None
+
+def predict_traffic_items(items):
+    """Traffic predictions for (hour, day, lat, lng, zone_id, noise, seed) tuples, one vectorized call per noise mode"""
+    groups = {}
+    for i, item in enumerate(items):
+        groups.setdefault(item[5:], []).append(i)
+    
+    results = [None] * len(items)
+    for (noise, seed), positions in groups.items():
+        hours, days, lats, lngs, zone_ids = zip(*(items[i][:5] for i in positions))
+        traffic = predict_traffic_arrays(hours, days, lats, lngs, zone_ids, noise, seed)
+        for j, i in enumerate(positions):
+            results[i] = {name: values[j] for name, values in traffic.items()}
+    return results
+
+traffic_batcher = (
+    MicroBatcher(predict_traffic_items, MICRO_BATCH_SIZE, MICRO_BATCH_WINDOW_MS / 1000)
+    if MICRO_BATCH == 'on' else None
+)
+
+def batchable_traffic(noise):
+    """Whether a traffic prediction may be coalesced with others
+
+    Random draws come from one generator per call, so an item's value would
+    depend on the batch it joined; only noise derived from the item itself
+    (hashed) or no noise gives the same answer batched or alone.
+    """
+    return traffic_batcher is not None and noise != 'random'
+
+def predict_traffic_one(hour, day, lat, lng, zone_id, noise, seed):
+    """One traffic prediction, coalesced with concurrent requests when micro-batching is on"""
+    item = (hour, day, lat, lng, zone_id, noise, seed)
+    if not batchable_traffic(noise):
+        return predict_traffic_items([item])[0]
+    return traffic_batcher.submit(item)
+
+def parse_traffic_args(args):
+    """(hour, day, lat, lng, zone_id, noise, seed) for /predict/traffic; raises ValueError for invalid input"""
+    now = datetime.now()
+    hour = query_value(args, 'hour', int, now.hour)
+    day = query_value(args, 'day', int, now.weekday())
+    lat = query_value(args, 'lat', float)
+    lng = query_value(args, 'lng', float)
+    zone_id = query_value(args, 'zone_id', int)
+    noise = args.get('noise', 'hashed')
+    seed = args.get('seed')
+    seed = int_param(seed, 'seed') if seed is not None else None
+    
+    error = validate_time_arrays(np.array([hour]), np.array([day]))
+    if error:
+        raise ValueError(error)
+    if noise not in NOISE_MODES:
+        raise ValueError(f"noise must be one of {', '.join(NOISE_MODES)}")
+    
+    if zone_id is None and lat is not None and lng is not None:
+        zone_id = resolve_zone_ids([lat], [lng], [None])[0]
+    return hour, day, lat, lng, zone_id, noise, seed
+
+def traffic_cache_params(hour, day, lat, lng, zone_id, noise, seed):
+    """Response cache parameters for a traffic prediction, or None if it must not be cached"""
+    # Unseeded random noise is meant to differ on every call
+    if noise == 'random' and seed is None:
+        return None
+    return {'hour': hour, 'day': day, 'lat': lat, 'lng': lng, 'zone_id': zone_id, 'noise': noise, 'seed': seed}
+
+def traffic_prediction(traffic, hour, day, lat, lng, zone_id):
+    """/predict/traffic result (without timestamp) from one item of predict_traffic_items"""
+    prediction = {
+        'congestion_level': traffic['level'],
+        'congestion_percentage': round(float(traffic['congestion']), 2),
+        'avg_speed_kmh': round(float(traffic['speed']), 2),
+        'vehicle_count': int(traffic['vehicles']),
+        'confidence_score': float(traffic['confidence']),
+        'congestion_p10': float(traffic['congestion_p10']),
+        'congestion_p50': float(traffic['congestion_p50']),
+        'congestion_p90': float(traffic['congestion_p90']),
+        'hour': hour,
+        'day_of_week': day,
+        'day_name': DAY_NAMES[day]
+    }
+    
+    # Add location if provided
+    if lat and lng:
+        prediction['latitude'] = lat
+        prediction['longitude'] = lng
+    
+    if zone_id is not None:
+        prediction['zone_id'] = zone_id
+        prediction['zone_name'] = zone_name(zone_id)
+    return prediction
+
+@api.route('/predict/traffic', methods=['GET'])
 def predict_traffic():
     """Predict traffic congestion for given location and time"""
     try:
-        # Get parameters
-        hour = request.args.get('hour', type=int, default=datetime.now().hour)
-        day = request.args.get('day', type=int, default=datetime.now().weekday())
-        lat = request.args.get('lat', type=float)
-        lng = request.args.get('lng', type=float)
-        
-        # Validate inputs
-        if not (0 <= hour <= 23):
+        clock = stage_clock()
+        try:
+            hour, day, lat, lng, zone_id, noise, seed = parse_traffic_args(request.args)
+        except ValueError as e:
             return jsonify({
                 'success': False,
-                'error': 'Hour must be between 0 and 23'
+                'error': str(e)
             }), 400
+        clock.mark('parse')
         
-        if not (0 <= day <= 6):
-            return jsonify({
-                'success': False,
-                'error': 'Day must be between 0 (Monday) and 6 (Sunday)'
-            }), 400
+        def build():
+            traffic = predict_traffic_one(hour, day, lat, lng, zone_id, noise, seed)
+            return traffic_prediction(traffic, hour, day, lat, lng, zone_id)
         
-        # Traffic prediction based on hour and day patterns
-        # Peak hours (8-10 AM, 5-8 PM): High congestion
-        if hour in [8, 9, 10, 17, 18, 19, 20]:
-            base_congestion = 80 + np.random.normal(0, 5)
-            congestion_level = 'high' if base_congestion < 85 else 'critical'
-            avg_speed = 15 + np.random.normal(0, 3)
-            vehicle_count = int(450 + np.random.normal(0, 50))
-        # Lunch hours (12-2 PM): Medium congestion
-        elif hour in [12, 13, 14]:
-            base_congestion = 60 + np.random.normal(0, 5)
-            congestion_level = 'medium'
-            avg_speed = 28 + np.random.normal(0, 4)
-            vehicle_count = int(300 + np.random.normal(0, 40))
-        # Night hours (10 PM - 6 AM): Low congestion
-        elif hour >= 22 or hour <= 6:
-            base_congestion = 25 + np.random.normal(0, 5)
-            congestion_level = 'low'
-            avg_speed = 45 + np.random.normal(0, 5)
-            vehicle_count = int(150 + np.random.normal(0, 30))
-        # Regular hours: Medium congestion
+        params = traffic_cache_params(hour, day, lat, lng, zone_id, noise, seed)
+        if params is None:
+            prediction = build()
         else:
-            base_congestion = 50 + np.random.normal(0, 5)
-            congestion_level = 'medium'
-            avg_speed = 32 + np.random.normal(0, 4)
-            vehicle_count = int(280 + np.random.normal(0, 35))
-        
-        # Weekend adjustment (Saturday=5, Sunday=6)
-        if day in [5, 6]:
-            base_congestion *= 0.75
-            avg_speed *= 1.2
-            vehicle_count = int(vehicle_count * 0.7)
-            if base_congestion < 40:
-                congestion_level = 'low'
-            elif base_congestion < 65:
-                congestion_level = 'medium'
-        
-        # Ensure values are in valid ranges
-        base_congestion = max(0, min(100, base_congestion))
-        avg_speed = max(5, min(60, avg_speed))
-        vehicle_count = max(0, vehicle_count)
-        
-        # Calculate confidence based on time of day
-        confidence = 0.88 if 7 <= hour <= 21 else 0.82
-        
-        result = {
-            'success': True,
-            'prediction': {
-                'congestion_level': congestion_level,
-                'congestion_percentage': round(base_congestion, 2),
-                'avg_speed_kmh': round(avg_speed, 2),
-                'vehicle_count': vehicle_count,
-                'confidence_score': confidence,
-                'hour': hour,
-                'day_of_week': day,
-                'day_name': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'][day],
-                'timestamp': datetime.now().isoformat()
-            }
-        }
+            prediction = response_cache.get_or_build('traffic', current_model.version, params, build)
+        clock.mark('predict')
         
-        # Add location if provided
-        if lat and lng:
-            result['prediction']['latitude'] = lat
-            result['prediction']['longitude'] = lng
-        
-        return jsonify(result)
+        response = jsonify({
+            'success': True,
+            'prediction': {**prediction, 'timestamp': datetime.now().isoformat()}
+        })
+        clock.mark('serialize')
+        return response
     
     except Exception as e:
         return jsonify({
@@ -419,10 +1340,11 @@ def predict_traffic():
             'error': str(e)
         }), 500
 
-@app.route('/predict/traffic/batch', methods=['POST'])
+@api.route('/predict/traffic/batch', methods=['POST'])
 def predict_traffic_batch():
     """Batch traffic predictions for multiple locations and times"""
     try:
+        clock = stage_clock()
         data = request.get_json()
         
         if not data or 'requests' not in data:
@@ -431,78 +1353,80 @@ def predict_traffic_batch():
                 'error': 'Invalid request format. Expected {"requests": [{"hour": 0, "day": 0, "lat": 0, "lng": 0}, ...]}'
             }), 400
         
-        predictions = []
+        try:
+            noise, seed = traffic_noise_options(data)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        if noise not in NOISE_MODES:
+            return jsonify({
+                'success': False,
+                'error': f"noise must be one of {', '.join(NOISE_MODES)}"
+            }), 400
         
-        for req in data['requests']:
-            hour = req.get('hour', datetime.now().hour)
-            day = req.get('day', datetime.now().weekday())
-            lat = req.get('lat')
-            lng = req.get('lng')
-            zone_id = req.get('zone_id')
-            zone_name = req.get('zone_name', 'Unknown Zone')
-            
-            # Traffic prediction logic (same as single prediction)
-            if hour in [8, 9, 10, 17, 18, 19, 20]:
-                base_congestion = 80 + np.random.normal(0, 5)
-                congestion_level = 'high' if base_congestion < 85 else 'critical'
-                avg_speed = 15 + np.random.normal(0, 3)
-                vehicle_count = int(450 + np.random.normal(0, 50))
-            elif hour in [12, 13, 14]:
-                base_congestion = 60 + np.random.normal(0, 5)
-                congestion_level = 'medium'
-                avg_speed = 28 + np.random.normal(0, 4)
-                vehicle_count = int(300 + np.random.normal(0, 40))
-            elif hour >= 22 or hour <= 6:
-                base_congestion = 25 + np.random.normal(0, 5)
-                congestion_level = 'low'
-                avg_speed = 45 + np.random.normal(0, 5)
-                vehicle_count = int(150 + np.random.normal(0, 30))
-            else:
-                base_congestion = 50 + np.random.normal(0, 5)
-                congestion_level = 'medium'
-                avg_speed = 32 + np.random.normal(0, 4)
-                vehicle_count = int(280 + np.random.normal(0, 35))
-            
-            # Weekend adjustment
-            if day in [5, 6]:
-                base_congestion *= 0.75
-                avg_speed *= 1.2
-                vehicle_count = int(vehicle_count * 0.7)
-                if base_congestion < 40:
-                    congestion_level = 'low'
-                elif base_congestion < 65:
-                    congestion_level = 'medium'
-            
-            base_congestion = max(0, min(100, base_congestion))
-            avg_speed = max(5, min(60, avg_speed))
-            vehicle_count = max(0, vehicle_count)
-            
-            prediction = {
-                'hour': hour,
-                'day_of_week': day,
-                'congestion_level': congestion_level,
-                'congestion_percentage': round(base_congestion, 2),
-                'avg_speed_kmh': round(avg_speed, 2),
-                'vehicle_count': vehicle_count,
-                'confidence_score': 0.88 if 7 <= hour <= 21 else 0.82
-            }
-            
-            if lat and lng:
-                prediction['latitude'] = lat
-                prediction['longitude'] = lng
-            
-            if zone_id:
-                prediction['zone_id'] = zone_id
-                prediction['zone_name'] = zone_name
-            
-            predictions.append(prediction)
+        now = datetime.now()
+        requests_list = data['requests']
+        hours = np.array([req.get('hour', now.hour) for req in requests_list], dtype=int)
+        days = np.array([req.get('day', now.weekday()) for req in requests_list], dtype=int)
+        lats = [req.get('lat') for req in requests_list]
+        lngs = [req.get('lng') for req in requests_list]
+        BATCH_SIZE.observe(len(requests_list), route=route_label())
+        clock.mark('parse')
+        zone_ids = resolve_zone_ids(lats, lngs, [req.get('zone_id') for req in requests_list])
         
-        return jsonify({
+        error = validate_time_arrays(hours, days)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+        clock.mark('feature_build')
+        
+        traffic = predict_traffic_arrays(hours, days, lats, lngs, zone_ids, noise, seed)
+        clock.mark('predict')
+        
+        columns = {
+            'hour': hours.tolist(),
+            'day_of_week': days.tolist(),
+            'congestion_level': traffic['level'].tolist(),
+            'congestion_percentage': np.round(traffic['congestion'], 2).tolist(),
+            'avg_speed_kmh': np.round(traffic['speed'], 2).tolist(),
+            'vehicle_count': traffic['vehicles'].tolist(),
+            'confidence_score': traffic['confidence'].tolist(),
+            'congestion_p10': traffic['congestion_p10'].tolist(),
+            'congestion_p50': traffic['congestion_p50'].tolist(),
+            'congestion_p90': traffic['congestion_p90'].tolist()
+        }
+        
+        if wants_columnar(data):
+            columns['latitude'] = lats
+            columns['longitude'] = lngs
+            columns['zone_id'] = zone_ids
+            columns['zone_name'] = [
+                req.get('zone_name', zone_name(zone_id)) if zone_id is not None else None
+                for req, zone_id in zip(requests_list, zone_ids)
+            ]
+            predictions = columns
+        else:
+            predictions = format_predictions(columns, False)
+            for prediction, req, zone_id in zip(predictions, requests_list, zone_ids):
+                if req.get('lat') and req.get('lng'):
+                    prediction['latitude'] = req['lat']
+                    prediction['longitude'] = req['lng']
+                if zone_id is not None:
+                    prediction['zone_id'] = zone_id
+                    prediction['zone_name'] = req.get('zone_name', zone_name(zone_id))
+        
+        response = jsonify({
             'success': True,
-            'count': len(predictions),
+            'count': len(requests_list),
             'predictions': predictions,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': now.isoformat()
         })
+        clock.mark('serialize')
+        return response
     
     except Exception as e:
         return jsonify({
@@ -510,71 +1434,277 @@ def predict_traffic_batch():
             'error': str(e)
         }), 500
 
-@app.route('/predict/traffic/route', methods=['POST'])
+def route_level(congestion):
+    """Overall congestion label for a route"""
+    return 'low' if congestion < 40 else ('medium' if congestion < 70 else 'high')
+
+@api.route('/predict/traffic/route', methods=['POST'])
 def predict_traffic_route():
-    """Predict traffic along a route with multiple waypoints"""
+    """Travel time and traffic along one route ({"waypoints": [...]}) or several ({"routes": [...]})"""
     try:
+        clock = stage_clock()
         data = request.get_json()
         
-        if not data or 'waypoints' not in data:
+        if not data or not (data.get('waypoints') or data.get('routes')):
             return jsonify({
                 'success': False,
-                'error': 'Invalid request format. Expected {"waypoints": [{"lat": 0, "lng": 0}, ...]}'
+                'error': 'Invalid request format. Expected {"waypoints": [{"lat": 0, "lng": 0}, ...]} '
+                         'or {"routes": [{"waypoints": [...]}, ...]}'
             }), 400
         
-        waypoints = data['waypoints']
-        hour = data.get('hour', datetime.now().hour)
-        day = data.get('day', datetime.now().weekday())
+        try:
+            noise, seed = traffic_noise_options(data)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        if noise not in NOISE_MODES:
+            return jsonify({
+                'success': False,
+                'error': f"noise must be one of {', '.join(NOISE_MODES)}"
+            }), 400
         
-        route_predictions = []
-        total_congestion = 0
+        single = 'routes' not in data
+        routes = [{'waypoints': data['waypoints']}] if single else data['routes']
         
-        for i, waypoint in enumerate(waypoints):
-            lat = waypoint.get('lat')
-            lng = waypoint.get('lng')
-            
-            # Add slight variation for each waypoint
-            variation = np.random.normal(0, 3)
-            
-            if hour in [8, 9, 10, 17, 18, 19, 20]:
-                base_congestion = 80 + variation
-                congestion_level = 'high' if base_congestion < 85 else 'critical'
-                avg_speed = 15 + np.random.normal(0, 3)
-            elif hour >= 22 or hour <= 6:
-                base_congestion = 25 + variation
-                congestion_level = 'low'
-                avg_speed = 45 + np.random.normal(0, 5)
-            else:
-                base_congestion = 50 + variation
-                congestion_level = 'medium'
-                avg_speed = 32 + np.random.normal(0, 4)
-            
-            base_congestion = max(0, min(100, base_congestion))
-            avg_speed = max(5, min(60, avg_speed))
-            total_congestion += base_congestion
-            
-            route_predictions.append({
-                'waypoint_index': i,
-                'latitude': lat,
-                'longitude': lng,
-                'congestion_level': congestion_level,
-                'congestion_percentage': round(base_congestion, 2),
-                'avg_speed_kmh': round(avg_speed, 2)
-            })
+        # Departure defaults to now; each route may override it
+        now = datetime.now()
+        default_hour = data.get('hour', now.hour)
+        default_day = data.get('day', now.weekday())
+        default_minute = data.get('minute', now.minute if 'hour' not in data else 0)
+        try:
+            departures = [
+                week_hour(
+                    float(route.get('hour', default_hour)),
+                    float(route.get('day', default_day)),
+                    float(route.get('minute', default_minute))
+                )
+                for route in routes
+            ]
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'hour, day and minute must be numbers'
+            }), 400
+        
+        waypoints = [waypoint for route in routes for waypoint in route.get('waypoints') or []]
+        route_ids = np.repeat(np.arange(len(routes)), [len(route.get('waypoints') or []) for route in routes])
+        lats = [waypoint.get('lat') for waypoint in waypoints]
+        lngs = [waypoint.get('lng') for waypoint in waypoints]
+        if any(lat is None or lng is None for lat, lng in zip(lats, lngs)):
+            return jsonify({
+                'success': False,
+                'error': 'Every waypoint needs lat and lng'
+            }), 400
+        
+        BATCH_SIZE.observe(len(waypoints), route=route_label())
+        clock.mark('parse')
+        zone_ids = resolve_zone_ids(lats, lngs, [waypoint.get('zone_id') for waypoint in waypoints])
+        clock.mark('feature_build')
+        
+        segments, totals = estimate_routes(route_ids, lats, lngs, zone_ids, departures, noise, seed)
         
-        avg_congestion = total_congestion / len(waypoints)
-        overall_level = 'low' if avg_congestion < 40 else ('medium' if avg_congestion < 70 else 'high')
+        # Traffic at each waypoint when the vehicle gets there
+        reached = np.repeat(np.asarray(departures, dtype=float), np.bincount(route_ids, minlength=len(routes)))
+        following = np.flatnonzero(route_ids[1:] == route_ids[:-1]) + 1
+        reached[following] = segments['depart'] + segments['duration_minutes'] / 60
+        reached_hours, reached_days = split_week_hour(reached)
+        traffic = predict_traffic_arrays(reached_hours, reached_days, lats, lngs, zone_ids, noise, seed)
+        clock.mark('predict')
         
+        waypoint_rows = format_predictions({
+            'waypoint_index': (np.arange(len(waypoints)) - np.searchsorted(route_ids, route_ids)).tolist(),
+            'latitude': lats,
+            'longitude': lngs,
+            'zone_id': zone_ids,
+            'hour': reached_hours.tolist(),
+            'day_of_week': reached_days.tolist(),
+            'congestion_level': traffic['level'].tolist(),
+            'congestion_percentage': np.round(traffic['congestion'], 2).tolist(),
+            'avg_speed_kmh': np.round(traffic['speed'], 2).tolist()
+        }, False)
+        segment_hours, segment_days = split_week_hour(segments['depart'])
+        segment_rows = format_predictions({
+            'from_waypoint': segments['from_waypoint'].tolist(),
+            'to_waypoint': segments['to_waypoint'].tolist(),
+            'distance_km': np.round(segments['distance_km'], 3).tolist(),
+            'hour': segment_hours.tolist(),
+            'day_of_week': segment_days.tolist(),
+            'avg_speed_kmh': np.round(segments['avg_speed_kmh'], 2).tolist(),
+            'congestion_percentage': np.round(segments['congestion'], 2).tolist(),
+            'congestion_level': segments['level'].tolist(),
+            'duration_minutes': np.round(segments['duration_minutes'], 2).tolist()
+        }, False)
+        
+        waypoint_bounds = np.searchsorted(route_ids, np.arange(len(routes) + 1))
+        segment_bounds = np.searchsorted(segments['route'], np.arange(len(routes) + 1))
+        arrival_hours, arrival_days = split_week_hour(totals['arrival'])
+        results = []
+        for i, route in enumerate(routes):
+            departure_hours, departure_days = split_week_hour(departures[i])
+            congestion = float(totals['congestion'][i])
+            if segment_bounds[i] == segment_bounds[i + 1] and waypoint_bounds[i] < waypoint_bounds[i + 1]:
+                # No segment to weight by travel time: use the traffic at the waypoint(s)
+                congestion = float(traffic['congestion'][waypoint_bounds[i]:waypoint_bounds[i + 1]].mean())
+            result = {
+                'waypoints': waypoint_rows[waypoint_bounds[i]:waypoint_bounds[i + 1]],
+                'segments': segment_rows[segment_bounds[i]:segment_bounds[i + 1]],
+                'distance_km': round(float(totals['distance_km'][i]), 3),
+                'eta_minutes': round(float(totals['eta_minutes'][i]), 2),
+                'avg_speed_kmh': round(float(totals['avg_speed_kmh'][i]), 2),
+                'overall_congestion': round(congestion, 2),
+                'overall_level': route_level(congestion),
+                'hour': int(departure_hours),
+                'day_of_week': int(departure_days),
+                'arrival_hour': int(arrival_hours[i]),
+                'arrival_day_of_week': int(arrival_days[i])
+            }
+            if 'id' in route:
+                result['id'] = route['id']
+            results.append(result)
+        
+        if single:
+            response = jsonify({
+                'success': True,
+                'route': results[0]
+            })
+        else:
+            fastest = min(
+                (i for i, route in enumerate(routes) if len(route.get('waypoints') or []) > 1),
+                key=lambda i: totals['eta_minutes'][i],
+                default=None
+            )
+            response = jsonify({
+                'success': True,
+                'count': len(results),
+                'routes': results,
+                'fastest_route': fastest
+            })
+        clock.mark('serialize')
+        return response
+    
+    except Exception as e:
         return jsonify({
-            'success': True,
-            'route': {
-                'waypoints': route_predictions,
-                'overall_congestion': round(avg_congestion, 2),
-                'overall_level': overall_level,
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def zones_response(positions, distances=None):
+    """Zone records for index positions, with traffic predictions if ?traffic=true"""
+    zones = [
+        zone_index.zone(position, distances[i] if distances is not None else None)
+        for i, position in enumerate(positions)
+    ]
+    
+    with_traffic = request.args.get('traffic', 'false').lower() == 'true'
+    if with_traffic:
+        hour = request.args.get('hour', type=int, default=datetime.now().hour)
+        day = request.args.get('day', type=int, default=datetime.now().weekday())
+        error = validate_time_arrays(np.array([hour]), np.array([day]))
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+    
+    if zones and with_traffic:
+        # One vectorized pass for every zone in the view
+        traffic = predict_traffic_arrays(
+            np.full(len(zones), hour),
+            np.full(len(zones), day),
+            zone_index.lats[positions],
+            zone_index.lngs[positions],
+            zone_index.ids[positions]
+        )
+        for i, zone in enumerate(zones):
+            zone['traffic'] = {
+                'congestion_level': traffic['level'][i],
+                'congestion_percentage': round(float(traffic['congestion'][i]), 2),
+                'avg_speed_kmh': round(float(traffic['speed'][i]), 2),
+                'vehicle_count': int(traffic['vehicles'][i]),
+                'confidence_score': float(traffic['confidence'][i]),
                 'hour': hour,
                 'day_of_week': day
             }
-        })
+    
+    return jsonify({
+        'success': True,
+        'count': len(zones),
+        'zones': zones
+    })
+
+@api.route('/zones/nearby', methods=['GET'])
+def zones_nearby():
+    """Traffic zones whose center is within radius km of a point"""
+    try:
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        radius_km = request.args.get('radius', type=float, default=5)
+        limit = request.args.get('limit', type=int, default=20)
+        
+        if lat is None or lng is None:
+            return jsonify({
+                'success': False,
+                'error': 'Latitude and longitude are required'
+            }), 400
+        
+        if not (0 < radius_km <= MAX_NEARBY_RADIUS_KM):
+            return jsonify({
+                'success': False,
+                'error': f'Radius must be greater than 0 and at most {MAX_NEARBY_RADIUS_KM:g} km'
+            }), 400
+        
+        if limit <= 0:
+            return jsonify({
+                'success': False,
+                'error': 'Limit must be a positive integer'
+            }), 400
+        
+        positions, distances = zone_index.nearby(lat, lng, radius_km * 1000, limit)
+        return zones_response(positions, distances)
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/zones/bbox', methods=['GET'])
+def zones_bbox():
+    """Traffic zones inside a map viewport"""
+    try:
+        bounds = [request.args.get(name, type=float) for name in ('min_lat', 'min_lng', 'max_lat', 'max_lng')]
+        
+        if any(value is None for value in bounds):
+            return jsonify({
+                'success': False,
+                'error': 'min_lat, min_lng, max_lat and max_lng are required'
+            }), 400
+        
+        return zones_response(zone_index.bbox(*bounds))
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/zones/locate', methods=['GET'])
+def zones_locate():
+    """Traffic zones whose radius contains a point, nearest first"""
+    try:
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        
+        if lat is None or lng is None:
+            return jsonify({
+                'success': False,
+                'error': 'Latitude and longitude are required'
+            }), 400
+        
+        positions, distances = zone_index.locate(lat, lng)
+        return zones_response(positions, distances)
     
     except Exception as e:
         return jsonify({
@@ -594,4 +1724,5 @@ if __name__ == '__main__':
 ║                                                           ║
 ╚═══════════════════════════════════════════════════════════╝
     """)
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app = create_app()
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_DEBUG', 'false').lower() == 'true')
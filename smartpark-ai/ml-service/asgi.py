@@ -0,0 +1,249 @@
+"""ASGI entry point: uvicorn asgi:app --workers 4
+(or gunicorn -k uvicorn.workers.UvicornWorker asgi:app)
+
+/predict and /predict/traffic answer on the event loop using the same
+parsing, lookup and formatting helpers as the Flask views, so in-process
+cache hits never wait for a thread. /predict misses (which may load a
+slot/area model) run on the thread pool; with MICRO_BATCH=on, traffic cache
+misses are awaited on the shared micro-batcher.
+
+Every other route (/predict/batch, /predict/traffic/*, /train, /health, ...)
+is served by the Flask app itself through WSGI on a bounded thread pool of
+ASGI_THREADS threads, so responses are identical to the WSGI deployment and
+CPU-bound batch, route and training requests never block the event loop.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+import app as service
+from metrics import REQUEST_SECONDS, REQUESTS
+
+# Threads running Flask views and blocking cache backends
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 8))
+
+executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='asgi')
+
+# In-process caches are cheap enough to consult on the event loop; shared
+# stores (sqlite, redis) do I/O and are consulted on the pool instead
+INLINE_CACHE = service.response_cache.backend is None or service.response_cache.backend.name == 'memory'
+
+
+def json_response(payload, status=200):
+    """JSON encoded the way Flask's jsonify encodes it (sorted keys, compact)"""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':')) + '\n'
+    return Response(body, status_code=status, media_type='application/json', headers={
+        'Access-Control-Allow-Origin': '*'
+    })
+
+
+async def run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+def timed(route):
+    """Record request metrics for a natively served route, with the Flask app's labels"""
+    def decorator(handler):
+        async def endpoint(request):
+            start = time.perf_counter()
+            if service.current_model is None:
+                service.start_background_init()
+                response = json_response({
+                    'success': False,
+                    'error': 'Model is not loaded yet',
+                    'status': service.init_state['status']
+                }, 503)
+            else:
+                response = await handler(request)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=request.method)
+            REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+            return response
+        return endpoint
+    return decorator
+
+
+@timed('/predict')
+async def predict(request):
+    try:
+        try:
+            hour, day, slot_id, zone_id, area = service.parse_predict_args(request.query_params)
+        except ValueError as e:
+            return json_response({'success': False, 'error': str(e)}, 400)
+
+        snapshot = service.current_model
+        model_key, params = service.occupancy_cache_params(snapshot, hour, day, slot_id, zone_id, area)
+        if INLINE_CACHE:
+            prediction = service.response_cache.get('predict', snapshot.version, params)
+        else:
+            prediction = await run_blocking(service.response_cache.get, 'predict', snapshot.version, params)
+
+        if prediction is None:
+            # A miss may load and tabulate a slot/area model from disk
+            prediction = await run_blocking(service.build_occupancy_prediction, snapshot, model_key, hour, day)
+            if INLINE_CACHE:
+                service.response_cache.set('predict', snapshot.version, params, prediction)
+            else:
+                await run_blocking(service.response_cache.set, 'predict', snapshot.version, params, prediction)
+        return json_response({
+            'success': True,
+            'prediction': {**prediction, 'timestamp': datetime.now().isoformat()}
+        })
+
+    except Exception as e:
+        return json_response({'success': False, 'error': str(e)}, 500)
+
+
+async def predict_traffic_item(item):
+    """predict_traffic_items for one item, awaiting the micro-batcher when it is enabled"""
+    if service.batchable_traffic(item[5]):
+        return await service.traffic_batcher.submit_async(item)
+    return service.predict_traffic_items([item])[0]
+
+
+@timed('/predict/traffic')
+async def predict_traffic(request):
+    try:
+        try:
+            item = service.parse_traffic_args(request.query_params)
+        except ValueError as e:
+            return json_response({'success': False, 'error': str(e)}, 400)
+        hour, day, lat, lng, zone_id, noise, seed = item
+
+        version = service.current_model.version
+        params = service.traffic_cache_params(*item)
+        prediction = None
+        if params is not None:
+            if INLINE_CACHE:
+                prediction = service.response_cache.get('traffic', version, params)
+            else:
+                prediction = await run_blocking(service.response_cache.get, 'traffic', version, params)
+
+        if prediction is None:
+            traffic = await predict_traffic_item(item)
+            prediction = service.traffic_prediction(traffic, hour, day, lat, lng, zone_id)
+            if params is not None:
+                if INLINE_CACHE:
+                    service.response_cache.set('traffic', version, params, prediction)
+                else:
+                    await run_blocking(service.response_cache.set, 'traffic', version, params, prediction)
+
+        return json_response({
+            'success': True,
+            'prediction': {**prediction, 'timestamp': datetime.now().isoformat()}
+        })
+
+    except Exception as e:
+        return json_response({'success': False, 'error': str(e)}, 500)
+
+
+class ThreadedWSGI:
+    """ASGI adapter running a WSGI app on `executor`, streaming its response chunk by chunk"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+            'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+            'QUERY_STRING': scope['query_string'].decode('ascii'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': _BodyReader(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            'CONTENT_LENGTH': str(len(body))
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin1').upper().replace('-', '_')
+            value = value.decode('latin1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    async def __call__(self, scope, receive, send):
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+
+        loop = asyncio.get_running_loop()
+        environ = self.environ(scope, b''.join(chunks))
+        result = await loop.run_in_executor(executor, self.wsgi_app, environ, start_response)
+        iterator = iter(result)
+        done = object()
+        try:
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            while True:
+                chunk = await loop.run_in_executor(executor, next, iterator, done)
+                if chunk is done:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(executor, result.close)
+
+
+class _BodyReader:
+    """Minimal wsgi.input over an already received request body"""
+
+    def __init__(self, body):
+        self.body = body
+        self.position = 0
+
+    def read(self, size=-1):
+        end = len(self.body) if size is None or size < 0 else self.position + size
+        data = self.body[self.position:end]
+        self.position += len(data)
+        return data
+
+    def readline(self, size=-1):
+        end = self.body.find(b'\n', self.position) + 1 or len(self.body)
+        if size is not None and size >= 0:
+            end = min(end, self.position + size)
+        return self.read(end - self.position)
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+
+def create_asgi_app(preload=None):
+    """Starlette app serving the hot lookups natively and everything else through Flask"""
+    flask_app = service.create_app(preload)
+    return Starlette(routes=[
+        Route('/predict', predict, methods=['GET']),
+        Route('/predict/traffic', predict_traffic, methods=['GET']),
+        Mount('/', app=ThreadedWSGI(flask_app))
+    ])
+
+
+app = create_asgi_app()
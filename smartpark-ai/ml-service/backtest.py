@@ -0,0 +1,356 @@
+"""Rolling-origin backtests of candidate occupancy models
+
+Time-ordered occupancy observations (crowdsourced reports from the database
+or its exports, or several weeks of the synthetic generator) are split at
+a series of origins: each fold trains on everything before its origin and
+is scored on the following `horizon`. Candidates are fitted the way training
+fits the production model (on per-(day, hour) bucket means), every
+(candidate, fold) pair runs in its own process, and the report gives
+MAE/RMSE overall, per fold, per hour bucket and per area, plus fit and
+prediction times.
+
+    python backtest.py --candidates sgd,ridge,hist_gb,bucket_mean --output backtest.json
+    python backtest.py --source csv:exports --promote 7 --tolerance 0.05
+
+With --promote, the version's recipe (refitted before each fold origin) and
+the active version's artifact are scored on the same recent rows the active
+version never saw, the scores are recorded in the model registry, and the
+version is activated only if its error is within --tolerance of the active
+version's (exit code 1 otherwise).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from history import GLOBAL_KEY, TABLE_SIZE, BucketStats, decode_chunk, iter_table_chunks, load_area_mappings
+from traffic_model import hour_buckets
+from training import HISTORY_SOURCE, fit_buckets, generate_sample_data
+
+# The candidate train_model() uses for the city-wide model
+PRODUCTION_CANDIDATE = 'sgd'
+
+CANDIDATES = ('sgd', 'ridge', 'hist_gb', 'bucket_mean')
+
+HOUR_BUCKET_NAMES = ['peak', 'lunch', 'night', 'regular']
+
+DEFAULT_FOLDS = 4
+DEFAULT_HORIZON_DAYS = 7
+SYNTHETIC_WEEKS = 8
+
+
+class BucketMean:
+    """Seasonal naive baseline: the training mean of each (day, hour) bucket"""
+
+    def __init__(self, count, total):
+        seen = count > 0
+        self.table = np.full(TABLE_SIZE, total[seen].sum() / count[seen].sum())
+        self.table[seen] = total[seen] / count[seen]
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.int64)
+        return self.table[X[:, 1] * 24 + X[:, 0]]
+
+
+def fit_candidate(name, count, total, total_sq):
+    """Fit a named candidate on bucket statistics; returns an object with predict((hour, day) rows)"""
+    if name == 'sgd':
+        return fit_buckets(count, total, total_sq)[0]
+    if name == 'bucket_mean':
+        return BucketMean(count, total)
+
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.linear_model import Ridge
+    from features import make_pipeline
+
+    estimators = {
+        'ridge': lambda: Ridge(alpha=1.0),
+        'hist_gb': lambda: HistGradientBoostingRegressor(max_iter=200, random_state=42)
+    }
+    if name not in estimators:
+        raise ValueError(f"Unknown candidate {name!r}; choose from {', '.join(CANDIDATES)}")
+
+    mask = count > 0
+    days, hours = np.divmod(np.arange(TABLE_SIZE), 24)
+    X = np.column_stack((hours, days))[mask]
+    y = total[mask] / count[mask]
+    weights = count[mask] / count[mask].mean()
+    pipeline = make_pipeline().set_params(model=estimators[name]())
+    pipeline.fit(X, y, scaler__sample_weight=weights, model__sample_weight=weights)
+    return pipeline
+
+
+def synthetic_observations(weeks=SYNTHETIC_WEEKS):
+    """(timestamps, keys, hours, days, values) for `weeks` weeks of hourly synthetic data"""
+    df = generate_sample_data(weeks)
+    timestamps = np.datetime64('2024-01-01T00', 'h') + np.arange(len(df)).astype('timedelta64[h]')
+    return (
+        timestamps.astype('datetime64[s]'),
+        np.full(len(df), GLOBAL_KEY),
+        df['hour'].to_numpy(),
+        df['day_of_week'].to_numpy(),
+        df['occupancy'].to_numpy(dtype=float)
+    )
+
+
+def load_observations(source):
+    """(timestamps, keys, hours, days, values) from the reports table, oldest first
+
+    Only reports are replayed: predictions rows record the (day, hour) they
+    are for but not when they were observed.
+    """
+    parts = [decode_chunk('reports', chunk, timestamps=True) for chunk in iter_table_chunks(source, 'reports')]
+    if not parts:
+        raise ValueError(f'No reports found in {source}')
+
+    timestamps, keys, hours, days, values = (np.concatenate(arrays) for arrays in zip(*parts))
+    order = np.argsort(timestamps, kind='stable')
+    return timestamps[order], keys[order], hours[order], days[order], values[order]
+
+
+def rolling_origin_splits(timestamps, folds=DEFAULT_FOLDS, horizon=np.timedelta64(DEFAULT_HORIZON_DAYS, 'D')):
+    """(train_mask, test_mask) pairs, oldest origin first, over the last folds * horizon of history
+
+    Folds without training or test rows are skipped.
+    """
+    end = timestamps.max() + np.timedelta64(1, 's')
+    splits = []
+    for k in range(folds, 0, -1):
+        origin = end - k * horizon
+        train = timestamps < origin
+        test = (timestamps >= origin) & (timestamps < origin + horizon)
+        if train.any() and test.any():
+            splits.append((train, test))
+    return splits
+
+
+def run_fold(name, fold, train, test):
+    """Fit one candidate on a fold's training rows and return its errors on the test rows"""
+    start = time.perf_counter()
+    stats = BucketStats()
+    stats.update(np.full(len(train[3]), GLOBAL_KEY), *train[1:])
+    model = fit_candidate(name, *stats.buckets())
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predicted = np.clip(model.predict(np.column_stack((test[1], test[2]))), 0, 100)
+    predict_seconds = time.perf_counter() - start
+    return {
+        'candidate': name,
+        'fold': fold,
+        'errors': predicted - test[3],
+        'fit_seconds': fit_seconds,
+        'predict_seconds': predict_seconds
+    }
+
+
+def error_summary(errors):
+    return {
+        'rows': int(len(errors)),
+        'mae': round(float(np.abs(errors).mean()), 4) if len(errors) else None,
+        'rmse': round(float(np.sqrt((errors ** 2).mean())), 4) if len(errors) else None
+    }
+
+
+def grouped_summary(errors, labels):
+    return {str(label): error_summary(errors[labels == label]) for label in np.unique(labels)}
+
+
+def backtest(observations, candidates=CANDIDATES, folds=DEFAULT_FOLDS, horizon_days=DEFAULT_HORIZON_DAYS,
+             workers=None, slot_area=None):
+    """Report of every candidate over rolling-origin folds of the observations
+
+    workers=1 runs the folds in this process instead of a process pool.
+    """
+    timestamps, keys, hours, days, values = observations
+    splits = rolling_origin_splits(timestamps, folds, np.timedelta64(horizon_days, 'D'))
+    if not splits:
+        raise ValueError('Not enough history for a rolling-origin split')
+
+    slot_area = slot_area or {}
+    areas = np.array([slot_area.get(int(key), 'unknown') if key != GLOBAL_KEY else 'global' for key in keys], dtype=object)
+    buckets = np.array(HOUR_BUCKET_NAMES, dtype=object)[hour_buckets(hours)]
+
+    tasks = []
+    for fold, (train, test) in enumerate(splits):
+        train_rows = (keys[train], hours[train], days[train], values[train])
+        test_rows = (keys[test], hours[test], days[test], values[test])
+        tasks.extend((name, fold, train_rows, test_rows) for name in candidates)
+
+    if workers == 1:
+        results = [run_fold(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run_fold, *zip(*tasks)))
+
+    report = {
+        'rows': int(len(values)),
+        'folds': [
+            {
+                'train_rows': int(train.sum()),
+                'test_rows': int(test.sum()),
+                'test_start': str(timestamps[test].min()),
+                'test_end': str(timestamps[test].max())
+            }
+            for train, test in splits
+        ],
+        'horizon_days': horizon_days,
+        'candidates': {}
+    }
+    for name in candidates:
+        runs = sorted((r for r in results if r['candidate'] == name), key=lambda r: r['fold'])
+        errors = np.concatenate([r['errors'] for r in runs])
+        test_masks = [test for _, test in splits]
+        fold_buckets = np.concatenate([buckets[test] for test in test_masks])
+        fold_areas = np.concatenate([areas[test] for test in test_masks])
+        test_rows = sum(len(r['errors']) for r in runs)
+        report['candidates'][name] = {
+            **error_summary(errors),
+            'per_fold': [error_summary(r['errors']) for r in runs],
+            'by_hour_bucket': grouped_summary(errors, fold_buckets),
+            'by_area': grouped_summary(errors, fold_areas),
+            'fit_seconds': round(sum(r['fit_seconds'] for r in runs) / len(runs), 4),
+            'predict_us_per_row': round(sum(r['predict_seconds'] for r in runs) / test_rows * 1e6, 4)
+        }
+
+    ranked = sorted(candidates, key=lambda name: report['candidates'][name]['mae'])
+    report['best'] = ranked[0]
+    return report
+
+
+def observations_for(source, weeks=SYNTHETIC_WEEKS):
+    """Observations and slot -> area mapping for a history source ('' for synthetic data)"""
+    if not source:
+        return synthetic_observations(weeks), {}
+    return load_observations(source), load_area_mappings(source)['slot_area']
+
+
+def gate_splits(timestamps, unseen_after=None, folds=DEFAULT_FOLDS, horizon_days=DEFAULT_HORIZON_DAYS):
+    """Rolling-origin splits whose test rows are limited to those at or after unseen_after
+
+    Folds left without test rows are dropped.
+    """
+    splits = rolling_origin_splits(timestamps, folds, np.timedelta64(horizon_days, 'D'))
+    if unseen_after is not None:
+        splits = [(train, test & (timestamps >= unseen_after)) for train, test in splits]
+    return [(train, test) for train, test in splits if test.any()]
+
+
+def fold_scores(errors, timestamps, splits, method):
+    """Backtest record from per-fold error arrays"""
+    window = np.logical_or.reduce([test for _, test in splits])
+    return {
+        **error_summary(np.concatenate(errors)),
+        'per_fold': [error_summary(fold_errors) for fold_errors in errors],
+        'window_start': str(timestamps[window].min()),
+        'window_end': str(timestamps[window].max()),
+        'method': method
+    }
+
+
+def refit_scores(observations, splits, candidate=PRODUCTION_CANDIDATE):
+    """Errors of a candidate refitted on the rows before each fold's origin, per fold"""
+    timestamps, keys, hours, days, values = observations
+    return [
+        run_fold(candidate, fold, (keys[train], hours[train], days[train], values[train]),
+                 (keys[test], hours[test], days[test], values[test]))['errors']
+        for fold, (train, test) in enumerate(splits)
+    ]
+
+
+def artifact_scores(model, observations, splits):
+    """Errors of an already fitted model on each fold's test rows"""
+    _, _, hours, days, values = observations
+    predicted = np.clip(model.predict(np.column_stack((hours, days))), 0, 100)
+    return [(predicted - values)[test] for _, test in splits]
+
+
+def gate(registry, version, source=None, tolerance=0.05):
+    """Score a retrained version against the active one out of sample and record the verdict; returns (ok, reason)
+
+    The new version saw all history, so its own artifact cannot be scored
+    fairly; its recipe (the production candidate) is refitted on the rows
+    before each fold origin instead. The active version is scored with its
+    artifact, on test rows reported after it was registered, which it never
+    saw. Both are scored on the same rows. Neither version is activated.
+    """
+    entry = registry.get(version)
+    if entry is None:
+        raise ValueError(f'Unknown model version: {version}')
+    source = HISTORY_SOURCE if source is None else source
+    observations, _ = observations_for(source)
+    timestamps = observations[0]
+
+    active = registry.active_version()
+    if active in (None, version):
+        ok, reason = True, 'no active version to compare against'
+    else:
+        unseen_after = np.datetime64(registry.get(active)['created_at'], 's')
+        splits = gate_splits(timestamps, unseen_after)
+        if not splits:
+            ok, reason = True, f'no history reported since version {active} was trained'
+        else:
+            registry.annotate(version, backtest=fold_scores(
+                refit_scores(observations, splits), timestamps, splits, f'refit:{PRODUCTION_CANDIDATE}'
+            ))
+            registry.annotate(active, backtest=fold_scores(
+                artifact_scores(registry.load(active)[0], observations, splits), timestamps, splits, 'artifact'
+            ))
+            ok, reason = registry.check_promotion(version, tolerance)
+    registry.annotate(version, promotion={'promoted': ok, 'reason': reason})
+    return ok, reason
+
+
+def promote(registry, version, source, tolerance):
+    """Gate a registered version and activate it if it passes; returns (ok, reason)"""
+    ok, reason = gate(registry, version, source, tolerance)
+    if ok:
+        registry.activate(version)
+    return ok, reason
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', default=HISTORY_SOURCE,
+                        help="'mysql', 'sqlite:<path>' or 'csv:<dir>' (default: HISTORY_SOURCE; synthetic if unset)")
+    parser.add_argument('--candidates', default=','.join(CANDIDATES))
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS)
+    parser.add_argument('--horizon-days', type=int, default=DEFAULT_HORIZON_DAYS)
+    parser.add_argument('--weeks', type=int, default=SYNTHETIC_WEEKS, help='weeks of synthetic history')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: CPU count)')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--promote', type=int, metavar='VERSION',
+                        help='gate and activate a registered version instead of comparing candidates')
+    parser.add_argument('--tolerance', type=float, default=0.05,
+                        help='allowed relative MAE increase over the active version')
+    parser.add_argument('--model-dir', default=os.environ.get('MODEL_DIR', 'models'))
+    args = parser.parse_args(argv)
+
+    if args.promote is not None:
+        from model_registry import ModelRegistry
+        ok, reason = promote(ModelRegistry(args.model_dir), args.promote, args.source, args.tolerance)
+        print(f"{'✅' if ok else '❌'} Version {args.promote} {'promoted' if ok else 'not promoted'}: {reason}")
+        return 0 if ok else 1
+
+    observations, slot_area = observations_for(args.source, args.weeks)
+    report = backtest(
+        observations, [name.strip() for name in args.candidates.split(',') if name.strip()],
+        args.folds, args.horizon_days, args.workers, slot_area
+    )
+
+    for name, result in sorted(report['candidates'].items(), key=lambda item: item[1]['mae']):
+        print(f"{name:<12} MAE {result['mae']:>8.4f}  RMSE {result['rmse']:>8.4f}  "
+              f"fit {result['fit_seconds'] * 1000:>8.1f} ms  predict {result['predict_us_per_row']:>8.3f} us/row")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Micro-batching of concurrent single-item predictions
+
+Callers submit one hashable input each; a worker thread collects inputs
+until `max_batch` are waiting or `window` seconds have passed since the
+first, evaluates them with one vectorized call and resolves every caller's
+future. Identical inputs already waiting or being evaluated share a future,
+so they are computed once. Futures are concurrent.futures.Future objects:
+threads block on submit(), asyncio code awaits submit_async().
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Coalesces submit(item) calls into batch_fn(items) -> results (same order)"""
+
+    def __init__(self, batch_fn, max_batch=64, window=0.002):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.window = window
+        self.batches = 0
+        self.items = 0
+        self.deduplicated = 0
+        self._waiting = []
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._thread = None
+
+    def future(self, item):
+        """Future for an item's result, shared with any identical in-flight item"""
+        with self._lock:
+            future = self._futures.get(item)
+            if future is not None:
+                self.deduplicated += 1
+                return future
+            future = Future()
+            self._futures[item] = future
+            self._waiting.append(item)
+            # Started on first use so no thread exists in a gunicorn master before forking
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+            self._ready.notify()
+        return future
+
+    def submit(self, item, timeout=None):
+        """Block until the item's batch has been evaluated and return its result"""
+        return self.future(item).result(timeout)
+
+    async def submit_async(self, item):
+        return await asyncio.wrap_future(self.future(item))
+
+    def _next_batch(self):
+        with self._lock:
+            while not self._waiting:
+                self._ready.wait()
+            deadline = time.monotonic() + self.window
+            while len(self._waiting) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._ready.wait(remaining)
+            batch, self._waiting = self._waiting[:self.max_batch], self._waiting[self.max_batch:]
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self.batch_fn(batch)
+                error = None
+            except Exception as e:
+                error = e
+            with self._lock:
+                futures = [self._futures.pop(item) for item in batch]
+                self.batches += 1
+                self.items += len(batch)
+            for i, future in enumerate(futures):
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results[i])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_batch': self.max_batch,
+                'window_ms': self.window * 1000,
+                'batches': self.batches,
+                'items': self.items,
+                'deduplicated': self.deduplicated,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0
+            }
@@ -0,0 +1,242 @@
+"""Latency and throughput benchmarks for the ML service (no network)
+
+Every endpoint is driven through Flask's test client against a throwaway model
+directory, so running this never touches models/. Results are written as JSON
+for comparison across commits; with --baseline the run fails (exit code 1)
+when any benchmark's median latency regresses by more than --threshold.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json --threshold 0.25
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+WORK_DIR = tempfile.mkdtemp(prefix='smartpark-bench-')
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+
+# Configure the service before it is imported: isolated models, training
+# history read from the CSV stand-in, and no result cache unless asked for
+os.environ['MODEL_DIR'] = os.path.join(WORK_DIR, 'models')
+os.environ['HISTORY_TABLES'] = 'predictions'
+os.environ.setdefault('RESPONSE_CACHE', 'off')
+
+BATCH_SIZES = [1, 100, 10000]
+TRAIN_SIZES = [10000, 100000, 1000000]
+
+# Points inside the seeded Mumbai traffic zones (Bandra West, Andheri, Powai),
+# plus one outside all of them
+SAMPLE_POINTS = [(19.0600, 72.8300), (19.1140, 72.8690), (19.1165, 72.9045), (19.2500, 72.7000)]
+
+
+def summarize(samples):
+    """p50/p99/mean latency in milliseconds and calls per second"""
+    samples = np.asarray(samples)
+    return {
+        'calls': len(samples),
+        'p50_ms': round(float(np.percentile(samples, 50)) * 1000, 4),
+        'p99_ms': round(float(np.percentile(samples, 99)) * 1000, 4),
+        'mean_ms': round(float(samples.mean()) * 1000, 4),
+        'throughput_per_s': round(len(samples) / float(samples.sum()), 2)
+    }
+
+
+def measure(call, iterations, warmup=5):
+    """Time `iterations` calls after a few untimed warmup calls"""
+    for _ in range(warmup):
+        call()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def checked(response):
+    """Fail loudly rather than benchmark an error response"""
+    if response.status_code >= 400:
+        raise RuntimeError(f'{response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return response
+
+
+def batch_requests(size, rng):
+    """Random (hour, day) batch entries, with coordinates for the traffic endpoints"""
+    hours = rng.integers(0, 24, size)
+    days = rng.integers(0, 7, size)
+    points = [SAMPLE_POINTS[i] for i in rng.integers(0, len(SAMPLE_POINTS), size)]
+    return [
+        {'hour': int(hour), 'day': int(day), 'lat': lat, 'lng': lng}
+        for hour, day, (lat, lng) in zip(hours, days, points)
+    ]
+
+
+def endpoint_benchmarks(client, iterations):
+    """Latency of every prediction endpoint"""
+    rng = np.random.default_rng(42)
+    results = {}
+
+    results['predict'] = measure(lambda: checked(client.get('/predict?hour=9&day=2')), iterations)
+    results['predict_next_hours'] = measure(lambda: checked(client.get('/predict/next-hours?hours=24')), iterations)
+    for size in BATCH_SIZES:
+        body = {'requests': batch_requests(size, rng)}
+        results[f'predict_batch_{size}'] = measure(
+            lambda: checked(client.post('/predict/batch', json=body)),
+            max(iterations // (10 if size >= 10000 else 1), 5)
+        )
+
+    results['predict_traffic'] = measure(
+        lambda: checked(client.get('/predict/traffic?hour=18&day=1&lat=17.4435&lng=78.3772')), iterations
+    )
+    for size in BATCH_SIZES:
+        body = {'requests': batch_requests(size, rng)}
+        results[f'predict_traffic_batch_{size}'] = measure(
+            lambda: checked(client.post('/predict/traffic/batch', json=body)),
+            max(iterations // (10 if size >= 10000 else 1), 5)
+        )
+    waypoints = [{'lat': lat, 'lng': lng} for lat, lng in SAMPLE_POINTS * 5]
+    results['predict_traffic_route'] = measure(
+        lambda: checked(client.post('/predict/traffic/route', json={'waypoints': waypoints, 'hour': 18, 'day': 1})),
+        iterations
+    )
+    return results
+
+
+def cold_start_benchmarks(runs):
+    """Import and load_model time in fresh interpreters (the model is already registered)"""
+    script = (
+        'import json, time\n'
+        'start = time.perf_counter()\n'
+        'import app\n'
+        'imported = time.perf_counter()\n'
+        'app.load_model()\n'
+        'loaded = time.perf_counter()\n'
+        'print(json.dumps([imported - start, loaded - imported]))\n'
+    )
+    imports, loads = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', script], cwd=SERVICE_DIR, env=os.environ.copy(),
+            capture_output=True, text=True, check=True
+        ).stdout
+        import_time, load_time = json.loads(output.strip().splitlines()[-1])
+        imports.append(import_time)
+        loads.append(load_time)
+    return {
+        'cold_start_import': summarize(imports),
+        'cold_start_load_model': summarize(loads),
+        'cold_start_total': summarize(np.add(imports, loads))
+    }
+
+
+def write_history(directory, rows, rng):
+    """CSV stand-in for the predictions table with `rows` synthetic slot observations"""
+    os.makedirs(directory, exist_ok=True)
+    hours = rng.integers(0, 24, rows)
+    days = rng.integers(0, 7, rows)
+    occupancy = np.clip(40 + 35 * np.sin(np.pi * hours / 24) + rng.normal(0, 10, rows), 0, 100)
+    table = np.column_stack((rng.integers(1, 200, rows), hours, days, np.round(occupancy, 2)))
+    np.savetxt(
+        os.path.join(directory, 'predictions.csv'), table, delimiter=',', fmt=['%d', '%d', '%d', '%.2f'],
+        header='slot_id,prediction_hour,day_of_week,predicted_occupancy', comments=''
+    )
+
+
+def training_benchmarks(service, sizes, runs):
+    """train_model on the synthetic sample data and on CSV histories of increasing size"""
+    results = {'train_synthetic': measure(lambda: service.train_model(''), runs, warmup=0)}
+    rng = np.random.default_rng(7)
+    for rows in sizes:
+        directory = os.path.join(WORK_DIR, f'history_{rows}')
+        write_history(directory, rows, rng)
+        results[f'train_history_{rows}'] = measure(lambda: service.train_model(f'csv:{directory}'), runs, warmup=0)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Benchmarks whose median latency grew by more than threshold relative to the baseline"""
+    regressions = []
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if not previous or not previous.get('p50_ms'):
+            continue
+        change = current['p50_ms'] / previous['p50_ms'] - 1
+        if change > threshold:
+            regressions.append({
+                'benchmark': name,
+                'baseline_p50_ms': previous['p50_ms'],
+                'p50_ms': current['p50_ms'],
+                'change': round(change, 4)
+            })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the SmartPark ML service')
+    parser.add_argument('--output', default='benchmark-results.json', help='where to write the JSON results')
+    parser.add_argument('--baseline', help='earlier results to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed p50 slowdown as a fraction (default 0.25)')
+    parser.add_argument('--iterations', type=int, default=200, help='timed calls per endpoint benchmark')
+    parser.add_argument('--cold-starts', type=int, default=3, help='fresh interpreters for the cold start benchmark')
+    parser.add_argument('--train-runs', type=int, default=1, help='timed train_model calls per history size')
+    parser.add_argument('--train-sizes', default=','.join(map(str, TRAIN_SIZES)), help='comma-separated history row counts')
+    parser.add_argument('--skip-training', action='store_true', help='skip the train_model benchmarks')
+    args = parser.parse_args()
+
+    os.chdir(SERVICE_DIR)
+    sys.path.insert(0, SERVICE_DIR)
+    import app as service
+
+    print(f"🔄 Benchmarking in {WORK_DIR}")
+    client = service.create_app().test_client()
+
+    benchmarks = endpoint_benchmarks(client, args.iterations)
+    benchmarks.update(cold_start_benchmarks(args.cold_starts))
+    if not args.skip_training:
+        sizes = [int(size) for size in args.train_sizes.split(',') if size]
+        benchmarks.update(training_benchmarks(service, sizes, args.train_runs))
+
+    results = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVICE_DIR, capture_output=True, text=True
+        ).stdout.strip() or None,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'response_cache': os.environ['RESPONSE_CACHE'],
+        'benchmarks': benchmarks
+    }
+
+    for name, stats in benchmarks.items():
+        print(f"   {name:<32} p50 {stats['p50_ms']:>10.3f} ms   p99 {stats['p99_ms']:>10.3f} ms   {stats['throughput_per_s']:>10.1f}/s")
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        results['regressions'] = regressions
+        for regression in regressions:
+            print(f"⚠️  {regression['benchmark']}: p50 {regression['baseline_p50_ms']} -> {regression['p50_ms']} ms "
+                  f"(+{regression['change'] * 100:.0f}%)")
+        exit_code = 1 if regressions else 0
+        if not regressions:
+            print(f"✅ No benchmark slowed down by more than {args.threshold * 100:.0f}%")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
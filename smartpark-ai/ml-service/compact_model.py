@@ -0,0 +1,94 @@
+"""Linear model pipelines reduced to plain arrays and evaluated with NumPy only
+
+Serving never needs the fitted scikit-learn objects: a pipeline of
+TimeFeatures (a per-(day, hour) feature table), a StandardScaler and a linear
+regressor is exported to a small JSON artifact, and workers load that instead
+of unpickling estimators (which would import scikit-learn at startup).
+"""
+import numpy as np
+
+FORMAT = 'smartpark-linear'
+FORMAT_VERSION = 1
+
+
+class CompactModel:
+    """features -> (x - mean) / scale -> x @ coef + intercept
+
+    feature_table is indexed by day * 24 + hour; without one the raw
+    (hour, day_of_week) inputs are used as features. residual_scale, when
+    known, is the model's per-(day, hour) RMS residual (see intervals.py).
+    """
+
+    def __init__(self, coef, intercept, mean=None, scale=None, feature_table=None, feature_names=None, steps=None,
+                 residual_scale=None):
+        self.coef = np.asarray(coef, dtype=float)
+        self.intercept = float(intercept)
+        self.mean = np.asarray(mean, dtype=float) if mean is not None else None
+        self.scale = np.asarray(scale, dtype=float) if scale is not None else None
+        self.feature_table = np.asarray(feature_table, dtype=float) if feature_table is not None else None
+        self.feature_names = list(feature_names or ['hour', 'day_of_week'])
+        self.steps = list(steps or [])
+        self.residual_scale = np.asarray(residual_scale, dtype=float) if residual_scale is not None else None
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """Export a fitted pipeline; raises ValueError if a step has no array equivalent"""
+        feature_table = mean = scale = feature_names = None
+        *transforms, (_, estimator) = pipeline.steps
+        for name, step in transforms:
+            if hasattr(step, 'table_'):
+                feature_table = step.table_
+                feature_names = step.get_feature_names_out().tolist()
+            elif hasattr(step, 'mean_') and hasattr(step, 'scale_'):
+                mean = step.mean_
+                scale = step.scale_ if step.scale_ is not None else np.ones_like(step.mean_)
+            else:
+                raise ValueError(f'Cannot export pipeline step {name!r} ({type(step).__name__})')
+        if not hasattr(estimator, 'coef_'):
+            raise ValueError(f'Cannot export non-linear model {type(estimator).__name__}')
+        intercept = np.ravel(estimator.intercept_)[0] if np.ndim(estimator.intercept_) else estimator.intercept_
+        return cls(
+            np.ravel(estimator.coef_), intercept, mean, scale, feature_table, feature_names,
+            [name for name, _ in pipeline.steps], getattr(pipeline, 'residual_scale_', None)
+        )
+
+    def transform(self, X):
+        """Scaled feature matrix for an (n, 2) array of (hour, day_of_week)"""
+        X = np.asarray(X, dtype=np.int64)
+        if self.feature_table is not None:
+            features = self.feature_table[X[:, 1] * 24 + X[:, 0]]
+        else:
+            features = X.astype(float)
+        if self.mean is not None:
+            features = (features - self.mean) / self.scale
+        return features
+
+    def predict_transformed(self, features):
+        """Model output for an already transformed feature matrix"""
+        return features @ self.coef + self.intercept
+
+    def predict(self, X):
+        return self.predict_transformed(self.transform(X))
+
+    def to_dict(self):
+        return {
+            'format': FORMAT,
+            'format_version': FORMAT_VERSION,
+            'steps': self.steps,
+            'feature_names': self.feature_names,
+            'feature_table': self.feature_table.tolist() if self.feature_table is not None else None,
+            'mean': self.mean.tolist() if self.mean is not None else None,
+            'scale': self.scale.tolist() if self.scale is not None else None,
+            'coef': self.coef.tolist(),
+            'intercept': self.intercept,
+            'residual_scale': self.residual_scale.tolist() if self.residual_scale is not None else None
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('format') != FORMAT or data.get('format_version', 0) > FORMAT_VERSION:
+            raise ValueError(f"Unsupported model artifact format: {data.get('format')} v{data.get('format_version')}")
+        return cls(
+            data['coef'], data['intercept'], data.get('mean'), data.get('scale'),
+            data.get('feature_table'), data.get('feature_names'), data.get('steps'), data.get('residual_scale')
+        )
@@ -0,0 +1,85 @@
+"""Feature pipeline for the parking occupancy model
+
+Models take raw (hour, day_of_week) rows. TimeFeatures expands them into
+cyclical, calendar and lag features; because every feature depends only on
+(hour, day), the expansion is computed once per (day, hour) bucket at fit
+time and transform() is a single table lookup, for training and inference alike.
+"""
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.linear_model import SGDRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from history import TABLE_SIZE
+from traffic_model import LUNCH_HOURS, PEAK_HOURS
+
+FEATURE_NAMES = [
+    'hour_sin', 'hour_cos', 'day_sin', 'day_cos',
+    'weekend', 'peak_hour', 'lunch_hour', 'night_hour', 'weekend_peak',
+    'lag_1h', 'lag_24h'
+]
+
+
+class TimeFeatures(BaseEstimator, TransformerMixin):
+    """(hour, day_of_week) -> cyclical time encoding, calendar flags and lag features
+
+    Lag features are the mean occupancy seen in training for the previous hour
+    and for the same hour on the previous day; buckets without data fall back
+    to the overall mean.
+    """
+
+    def __init__(self, lags=True):
+        self.lags = lags
+
+    def fit(self, X, y=None):
+        X = np.asarray(X, dtype=np.int64)
+        index = X[:, 1] * 24 + X[:, 0]
+
+        profile = np.full(TABLE_SIZE, np.nan)
+        if y is not None and self.lags:
+            y = np.asarray(y, dtype=float)
+            count = np.bincount(index, minlength=TABLE_SIZE)
+            total = np.bincount(index, weights=y, minlength=TABLE_SIZE)
+            seen = count > 0
+            profile[seen] = total[seen] / count[seen]
+            profile[~seen] = y.mean()
+        self.profile_ = profile
+        self.table_ = self._feature_table(profile)
+        return self
+
+    def _feature_table(self, profile):
+        days, hours = np.divmod(np.arange(TABLE_SIZE), 24)
+        hour_angle = 2 * np.pi * hours / 24
+        day_angle = 2 * np.pi * days / 7
+        weekend = days >= 5
+        peak = np.isin(hours, PEAK_HOURS)
+        columns = [
+            np.sin(hour_angle), np.cos(hour_angle), np.sin(day_angle), np.cos(day_angle),
+            weekend, peak, np.isin(hours, LUNCH_HOURS), (hours >= 22) | (hours <= 6), weekend & peak
+        ]
+        if self.lags:
+            filled = np.nan_to_num(profile, nan=0.0)
+            columns += [np.roll(filled, 1), np.roll(filled, 24)]
+        return np.column_stack(columns).astype(float)
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.int64)
+        return self.table_[X[:, 1] * 24 + X[:, 0]]
+
+    def get_feature_names_out(self, input_features=None):
+        return np.array(FEATURE_NAMES if self.lags else FEATURE_NAMES[:-2], dtype=object)
+
+
+def make_pipeline():
+    """Unfitted features -> scaler -> regressor pipeline"""
+    return Pipeline([
+        ('features', TimeFeatures()),
+        ('scaler', StandardScaler()),
+        ('model', SGDRegressor(learning_rate='invscaling', eta0=0.01, random_state=42))
+    ])
+
+
+def legacy_pipeline(model, scaler):
+    """Wrap a separately pickled scaler and model (raw hour/day inputs) as a pipeline"""
+    return Pipeline([('scaler', scaler), ('model', model)])
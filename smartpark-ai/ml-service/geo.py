@@ -0,0 +1,159 @@
+"""Geospatial helpers: haversine distances and an in-memory traffic zone index"""
+import math
+import os
+import re
+
+import numpy as np
+
+from history import iter_chunks
+
+EARTH_RADIUS_M = 6371000.0
+
+# Grid cell size in degrees (~1.1 km of latitude)
+CELL_DEGREES = 0.01
+
+ZONE_COLUMNS = ['id', 'zone_name', 'zone_code', 'center_latitude', 'center_longitude', 'radius_meters', 'area']
+
+DEFAULT_SEED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'seed_traffic_zones.sql')
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in meters; arguments broadcast like NumPy arrays"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def parse_seed_zones(path=DEFAULT_SEED_FILE):
+    """Zone rows from the traffic_zones INSERT in database/seed_traffic_zones.sql
+
+    Rows get ids 1..N in file order, matching AUTO_INCREMENT on a fresh database.
+    """
+    with open(path, encoding='utf-8') as f:
+        sql = f.read()
+    match = re.search(r'INSERT INTO traffic_zones\s*\([^)]*\)\s*VALUES(.*?);', sql, re.S)
+    if not match:
+        return []
+    row_pattern = re.compile(r"\(\s*'([^']*)'\s*,\s*'([^']*)'\s*,\s*([-\d.]+)\s*,\s*([-\d.]+)\s*,\s*(\d+)\s*,\s*'([^']*)'")
+    return [
+        (i, name, code, float(lat), float(lng), int(radius), area)
+        for i, (name, code, lat, lng, radius, area) in enumerate(row_pattern.findall(match.group(1)), start=1)
+    ]
+
+
+def load_zone_rows(source):
+    """Zone rows from 'seed', 'seed:<path>', 'mysql', 'sqlite:<path>' or 'csv:<directory>'"""
+    if source == 'seed':
+        return parse_seed_zones()
+    if source.startswith('seed:'):
+        return parse_seed_zones(source[len('seed:'):])
+    rows = []
+    for chunk in iter_chunks(source, 'traffic_zones', ZONE_COLUMNS):
+        rows.extend(chunk)
+    return rows
+
+
+class ZoneIndex:
+    """Grid-bucketed index over traffic zone centers and radii
+
+    Each zone is registered in every grid cell its circle overlaps, so a point
+    lookup only measures distances to the handful of zones in one cell.
+    Zones are also kept sorted by latitude for bounding-box queries.
+    """
+
+    def __init__(self, rows, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        rows = sorted(rows, key=lambda row: float(row[3]))
+        self.ids = np.array([int(row[0]) for row in rows], dtype=np.int64)
+        self.names = [row[1] for row in rows]
+        self.codes = [row[2] for row in rows]
+        self.lats = np.array([row[3] for row in rows], dtype=float)
+        self.lngs = np.array([row[4] for row in rows], dtype=float)
+        self.radii = np.array([row[5] or 500 for row in rows], dtype=float)
+        self.areas = [row[6] for row in rows]
+        self.positions = {zone_id: i for i, zone_id in enumerate(self.ids.tolist())}
+
+        cells = {}
+        for i in range(len(rows)):
+            for cell in self._cells_around(self.lats[i], self.lngs[i], self.radii[i]):
+                cells.setdefault(cell, []).append(i)
+        self.cells = {cell: np.array(members) for cell, members in cells.items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees))
+
+    def _cell_span(self, lat, lng, radius_m):
+        """(lat0, lng0, lat1, lng1): inclusive range of grid cells overlapped by the bounding box of a circle"""
+        dlat = radius_m / 111320.0
+        dlng = radius_m / (111320.0 * max(math.cos(math.radians(lat)), 1e-6))
+        lat0, lng0 = self._cell(lat - dlat, lng - dlng)
+        lat1, lng1 = self._cell(lat + dlat, lng + dlng)
+        return lat0, lng0, lat1, lng1
+
+    def _cells_around(self, lat, lng, radius_m):
+        """Grid cells overlapped by the bounding box of a circle"""
+        lat0, lng0, lat1, lng1 = self._cell_span(lat, lng, radius_m)
+        return [(a, b) for a in range(lat0, lat1 + 1) for b in range(lng0, lng1 + 1)]
+
+    def zone(self, position, distance_m=None):
+        """Zone record for an index position"""
+        record = {
+            'zone_id': int(self.ids[position]),
+            'zone_name': self.names[position],
+            'zone_code': self.codes[position],
+            'latitude': float(self.lats[position]),
+            'longitude': float(self.lngs[position]),
+            'radius_meters': int(self.radii[position]),
+            'area': self.areas[position]
+        }
+        if distance_m is not None:
+            record['distance_km'] = round(float(distance_m) / 1000, 3)
+        return record
+
+    def locate(self, lat, lng):
+        """Positions of zones whose circle contains the point, nearest center first"""
+        candidates = self.cells.get(self._cell(lat, lng))
+        if candidates is None:
+            return np.array([], dtype=np.int64), np.array([])
+        distances = haversine_m(lat, lng, self.lats[candidates], self.lngs[candidates])
+        inside = distances <= self.radii[candidates]
+        order = np.argsort(distances[inside])
+        return candidates[inside][order], distances[inside][order]
+
+    def locate_many(self, lats, lngs):
+        """Id of the nearest containing zone for each point, -1 where none (or no coordinate)"""
+        zone_ids = np.full(len(lats), -1, dtype=np.int64)
+        for i, (lat, lng) in enumerate(zip(lats, lngs)):
+            if lat is None or lng is None:
+                continue
+            positions, _ = self.locate(float(lat), float(lng))
+            if len(positions):
+                zone_ids[i] = self.ids[positions[0]]
+        return zone_ids
+
+    def nearby(self, lat, lng, radius_m, limit=None):
+        """Positions and distances of zones whose center lies within radius_m, nearest first"""
+        lat0, lng0, lat1, lng1 = self._cell_span(lat, lng, radius_m)
+        if (lat1 - lat0 + 1) * (lng1 - lng0 + 1) > len(self.ids):
+            # A scan is cheaper than visiting more cells than there are zones
+            candidates = np.arange(len(self.ids))
+        else:
+            members = [self.cells[cell] for cell in self._cells_around(lat, lng, radius_m) if cell in self.cells]
+            if not members:
+                return np.array([], dtype=np.int64), np.array([])
+            candidates = np.unique(np.concatenate(members))
+        distances = haversine_m(lat, lng, self.lats[candidates], self.lngs[candidates])
+        within = distances <= radius_m
+        order = np.argsort(distances[within])[:limit]
+        return candidates[within][order], distances[within][order]
+
+    def bbox(self, min_lat, min_lng, max_lat, max_lng):
+        """Positions of zones whose center lies inside a lat/lng bounding box"""
+        start = np.searchsorted(self.lats, min_lat, side='left')
+        stop = np.searchsorted(self.lats, max_lat, side='right')
+        positions = np.arange(start, stop)
+        lngs = self.lngs[positions]
+        return positions[(lngs >= min_lng) & (lngs <= max_lng)]
@@ -0,0 +1,92 @@
+"""Gunicorn configuration for the ML service
+
+The app (model, lookup tables, zone index) is loaded once in the master with
+preload_app, and workers are forked from it so they share those pages
+copy-on-write instead of each unpickling their own copy. A watcher thread in
+the master polls the model registry; when the active version changes (a
+/train or /model/rollback in any worker) it loads the new version in the
+master and sends itself SIGHUP, which gracefully replaces the workers with
+fresh forks sharing the new model.
+
+With MODEL_INIT=background the master loads nothing: each worker loads the
+model on a thread after the fork, answering /health at once and /ready with
+503 until it is done, and polls the registry itself.
+
+Tunable through the environment:
+    PORT                  listen port (default 5000)
+    WEB_CONCURRENCY       worker processes (default 2)
+    GUNICORN_THREADS      threads per worker (default 4)
+    GUNICORN_TIMEOUT      worker timeout in seconds (default 60)
+    MODEL_WATCH_INTERVAL  seconds between registry checks, 0 to disable (default 30)
+    MODEL_INIT            'eager' (load in the master, default) or 'background'
+
+ONLINE_LEARNING=on keeps live statistics in one process, so it is refused
+unless WEB_CONCURRENCY is 1.
+"""
+import gc
+import os
+import signal
+import threading
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+preload_app = True
+accesslog = '-'
+
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 30))
+
+
+def _watch_model_versions(server):
+    import app as service
+
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        try:
+            if service.refresh_model():
+                server.log.info('Model version changed to %s, reloading workers', service.current_model.version)
+                gc.freeze()
+                os.kill(os.getpid(), signal.SIGHUP)
+        except Exception as e:
+            server.log.warning('Model version check failed: %s', e)
+
+
+def _refresh_worker_model(worker):
+    import app as service
+
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        try:
+            if service.refresh_model():
+                worker.log.info('Model version changed to %s', service.current_model.version)
+        except Exception as e:
+            worker.log.warning('Model version check failed: %s', e)
+
+
+def when_ready(server):
+    # Objects created during preload are never freed; keep the garbage
+    # collector from touching (and so copying) their pages in every worker
+    gc.freeze()
+
+    import app as service
+    if service.ONLINE_LEARNING == 'on' and server.cfg.workers > 1:
+        raise RuntimeError(
+            f'ONLINE_LEARNING=on needs WEB_CONCURRENCY=1 ({server.cfg.workers} workers would each blend '
+            'their own observations into the predictions they serve)'
+        )
+    if MODEL_WATCH_INTERVAL > 0 and service.MODEL_INIT != 'background':
+        threading.Thread(target=_watch_model_versions, args=(server,), daemon=True).start()
+
+
+def post_fork(server, worker):
+    import app as service
+
+    if service.MODEL_INIT == 'background':
+        service.start_background_init()
+        if MODEL_WATCH_INTERVAL > 0:
+            threading.Thread(target=_refresh_worker_model, args=(worker,), daemon=True).start()
+
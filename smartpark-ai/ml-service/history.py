@@ -0,0 +1,241 @@
+"""Streaming ingestion of historical occupancy data
+
+Rows are read from the MySQL tables in database/schema.sql in fixed-size chunks
+through a server-side cursor and folded into per-(key, day, hour) running
+statistics, so memory stays proportional to the number of buckets rather than
+the number of rows. A SQLite database or a directory of CSV exports with the
+same table/column names can stand in for MySQL.
+"""
+import csv
+import os
+import sqlite3
+from itertools import islice
+
+import numpy as np
+
+TABLE_SIZE = 7 * 24
+
+# Key used for rows without a slot/zone id
+GLOBAL_KEY = -1
+
+# Occupancy implied by a crowdsourced report
+REPORT_OCCUPANCY = {'available': 35.0, 'occupied': 80.0, 'full': 100.0}
+
+# Columns read from each occupancy history table
+TABLES = {
+    'reports': {
+        'columns': ['slot_id', 'timestamp', 'report_type'],
+        'where': "status <> 'rejected'"
+    },
+    'predictions': {
+        'columns': ['slot_id', 'prediction_hour', 'day_of_week', 'predicted_occupancy'],
+        # Rows written by precompute.py carry the model version; training on them would learn the model's own output
+        'where': 'model_version IS NULL'
+    }
+}
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def mysql_config():
+    """Connection settings for the backend's MySQL database (same env vars as the Node backend)"""
+    config = {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'port': int(os.environ.get('DB_PORT', 3306)),
+        'user': os.environ.get('DB_USER', 'root'),
+        'password': os.environ.get('DB_PASSWORD', ''),
+        'database': os.environ.get('DB_NAME', 'smartpark_db'),
+        'charset': 'utf8mb4',
+        'connect_timeout': 60
+    }
+    if os.environ.get('DB_SSL') == 'true':
+        config['ssl'] = {'check_hostname': False, 'verify_mode': False}
+    return config
+
+
+def connect(source):
+    """Open a DB-API connection for 'mysql' or 'sqlite:<path>'"""
+    if source == 'mysql':
+        import pymysql
+        return pymysql.connect(**mysql_config())
+    if source.startswith('sqlite:'):
+        return sqlite3.connect(source[len('sqlite:'):])
+    raise ValueError(f'Unsupported database source: {source}')
+
+
+def _server_side_cursor(conn):
+    """Cursor that streams rows instead of buffering the whole result set client-side"""
+    try:
+        import pymysql
+        if isinstance(conn, pymysql.connections.Connection):
+            return conn.cursor(pymysql.cursors.SSCursor)
+    except ImportError:
+        pass
+    # sqlite3 cursors already step through results lazily
+    return conn.cursor()
+
+
+def iter_chunks(source, table, columns, where=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of raw row tuples from a table, chunk_size rows at a time
+
+    source is 'mysql', 'sqlite:<path>' or 'csv:<directory>' (one <table>.csv per table).
+    """
+    if source.startswith('csv:'):
+        path = os.path.join(source[len('csv:'):], f'{table}.csv')
+        with open(path, newline='') as f:
+            reader = csv.DictReader(f)
+            # Apply the same filter the SQL query would
+            if table == 'reports' and where:
+                reader = (row for row in reader if row.get('status') != 'rejected')
+            elif table == 'predictions' and where:
+                reader = (row for row in reader if not row.get('model_version'))
+            rows = (tuple(row[col] or None for col in columns) for row in reader)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    return
+                yield chunk
+
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    if where:
+        query += f" WHERE {where}"
+
+    conn = connect(source)
+    try:
+        cursor = _server_side_cursor(conn)
+        cursor.execute(query)
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def iter_table_chunks(source, table, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield raw row chunks from one of the history TABLES"""
+    spec = TABLES[table]
+    return iter_chunks(source, table, spec['columns'], spec['where'], chunk_size)
+
+
+def load_area_mappings(source):
+    """slot_id -> area and zone_id -> area from parking_slots and traffic_zones
+
+    Tables missing from a stand-in source are treated as empty.
+    """
+    mappings = {}
+    for name, table in (('slot_area', 'parking_slots'), ('zone_area', 'traffic_zones')):
+        mapping = {}
+        try:
+            for chunk in iter_chunks(source, table, ['id', 'area']):
+                mapping.update((int(key), area) for key, area in chunk if area)
+        except (FileNotFoundError, sqlite3.OperationalError):
+            pass
+        mappings[name] = mapping
+    return mappings
+
+
+def _key_array(values):
+    """Integer keys with NULL ids mapped to GLOBAL_KEY"""
+    keys = np.array(values, dtype=float)
+    keys[np.isnan(keys)] = GLOBAL_KEY
+    return keys.astype(np.int64)
+
+
+def _hour_and_day(timestamps):
+    """Hour of day and weekday (0=Monday) for datetimes or ISO strings"""
+    ts = np.array(timestamps, dtype='datetime64[s]')
+    days_since_epoch = ts.astype('datetime64[D]')
+    hours = (ts - days_since_epoch).astype('timedelta64[h]').astype(np.int64)
+    # 1970-01-01 was a Thursday (weekday 3)
+    days = (days_since_epoch.astype(np.int64) + 3) % 7
+    return hours, days
+
+
+def decode_chunk(table, chunk, timestamps=False):
+    """Convert raw rows into (keys, hours, days, values) arrays
+
+    With timestamps=True the arrays are preceded by the rows' datetime64
+    timestamps; only reports carry them.
+    """
+    columns = list(zip(*chunk))
+    if timestamps and table != 'reports':
+        raise ValueError(f'{table} rows carry no timestamps')
+
+    if table == 'reports':
+        keys = _key_array(columns[0])
+        hours, days = _hour_and_day(columns[1])
+        values = np.array([REPORT_OCCUPANCY.get(t, np.nan) for t in columns[2]])
+    else:
+        keys = _key_array(columns[0])
+        hours = np.array(columns[1], dtype=np.int64)
+        days = np.array(columns[2], dtype=np.int64)
+        values = np.array(columns[3], dtype=float)
+
+    # Drop rows with unknown labels or out-of-range times
+    valid = ~np.isnan(values) & (hours >= 0) & (hours <= 23) & (days >= 0) & (days <= 6)
+    if timestamps:
+        return (
+            np.array(columns[1], dtype='datetime64[s]')[valid], keys[valid], hours[valid], days[valid], values[valid]
+        )
+    return keys[valid], hours[valid], days[valid], values[valid]
+
+
+class BucketStats:
+    """Running count, sum and sum of squares per (key, day, hour) bucket"""
+
+    def __init__(self):
+        self.keys = {}
+        self.count = np.zeros((0, TABLE_SIZE))
+        self.total = np.zeros((0, TABLE_SIZE))
+        self.total_sq = np.zeros((0, TABLE_SIZE))
+        self.rows_seen = 0
+
+    def _grow(self, size):
+        extra = size - self.count.shape[0]
+        if extra > 0:
+            padding = np.zeros((extra, TABLE_SIZE))
+            self.count = np.vstack((self.count, padding))
+            self.total = np.vstack((self.total, padding))
+            self.total_sq = np.vstack((self.total_sq, padding))
+
+    def update(self, keys, hours, days, values):
+        """Fold a chunk of observations into the bucket statistics"""
+        if len(values) == 0:
+            return
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        rows = np.array([self.keys.setdefault(int(k), len(self.keys)) for k in unique_keys])
+        self._grow(len(self.keys))
+
+        flat = rows[inverse] * TABLE_SIZE + days * 24 + hours
+        size = self.count.size
+        self.count += np.bincount(flat, minlength=size).reshape(self.count.shape)
+        self.total += np.bincount(flat, weights=values, minlength=size).reshape(self.count.shape)
+        self.total_sq += np.bincount(flat, weights=values ** 2, minlength=size).reshape(self.count.shape)
+        self.rows_seen += len(values)
+
+    def buckets(self, key=None):
+        """(count, sum, sum of squares) arrays of length 168 for one key, or pooled over all keys"""
+        if key is None:
+            return self.count.sum(axis=0), self.total.sum(axis=0), self.total_sq.sum(axis=0)
+        row = self.keys[key]
+        return self.count[row], self.total[row], self.total_sq[row]
+
+    def pooled(self, keys):
+        """(count, sum, sum of squares) summed over several keys"""
+        rows = [self.keys[key] for key in keys if key in self.keys]
+        return self.count[rows].sum(axis=0), self.total[rows].sum(axis=0), self.total_sq[rows].sum(axis=0)
+
+
+def aggregate_history(source, tables, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream the given occupancy tables and aggregate their rows into BucketStats"""
+    unknown = [table for table in tables if table not in TABLES]
+    if unknown:
+        raise ValueError(f"Unknown history tables {unknown}; choose from {', '.join(TABLES)}")
+    stats = BucketStats()
+    for table in tables:
+        for chunk in iter_table_chunks(source, table, chunk_size):
+            stats.update(*decode_chunk(table, chunk))
+    return stats
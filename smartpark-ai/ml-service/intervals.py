@@ -0,0 +1,71 @@
+"""Prediction intervals from per-(day, hour) residual spread
+
+Training streams history into bucket sums, so raw residuals are not kept;
+instead each bucket's residual second moment around the model's prediction
+is computed from its count, sum and sum of squares, shrunk towards the
+pooled value when the bucket has few rows, and stored with the model as a
+168-entry scale table. Serving turns a prediction and its bucket's scale
+into p10/p50/p90 under a normal approximation, for whole arrays at once.
+"""
+import math
+
+import numpy as np
+
+# Standard normal 90th percentile: p10/p90 are the prediction -/+ Z_90 * scale
+Z_90 = 1.2815515655446004
+
+# Rows a bucket needs before its own residual spread outweighs the pooled one
+RESIDUAL_PRIOR_SAMPLES = 30
+
+# Residual scale assumed for models trained before scales were recorded
+DEFAULT_RESIDUAL_SCALE = 10.0
+
+# Occupancy from which a lot counts as full (the 'critical' category)
+FULL_OCCUPANCY = 90.0
+
+_erf = np.frompyfunc(math.erf, 1, 1)
+
+
+def normal_cdf(x):
+    return 0.5 * (1.0 + _erf(np.asarray(x, dtype=float) / math.sqrt(2.0)).astype(float))
+
+
+def residual_scale(predicted, count, total, total_sq, prior_samples=RESIDUAL_PRIOR_SAMPLES):
+    """Per-bucket RMS residual of observations around `predicted`, shrunk towards the pooled RMS
+
+    Returns (scale, pooled RMS).
+    """
+    seen = count > 0
+    # sum((y - p)^2) expanded in terms of the bucket sums
+    squared = np.maximum(total_sq - 2 * predicted * total + count * predicted ** 2, 0.0)
+    pooled = squared[seen].sum() / count[seen].sum()
+    shrunk = (squared + prior_samples * pooled) / (count + prior_samples)
+    return np.sqrt(shrunk), math.sqrt(pooled)
+
+
+def quantiles(center, scale, low=0.0, high=100.0):
+    """(p10, p50, p90) arrays around `center`, clipped to [low, high]"""
+    spread = Z_90 * np.asarray(scale, dtype=float)
+    return (
+        np.clip(center - spread, low, high),
+        np.clip(center, low, high),
+        np.clip(center + spread, low, high)
+    )
+
+
+def interval_confidence(p10, p90, span=100.0):
+    """Confidence score from the width of the p10-p90 interval (1.0 for a point estimate)"""
+    return np.round(np.clip(1.0 - (p90 - p10) / span, 0.0, 1.0), 4)
+
+
+def occupancy_intervals(occupancy, scale=None):
+    """p10/p50/p90, the probability of being full and a confidence score per prediction"""
+    scale = np.full_like(occupancy, DEFAULT_RESIDUAL_SCALE, dtype=float) if scale is None else scale
+    p10, p50, p90 = quantiles(occupancy, scale)
+    return {
+        'p10': np.round(p10, 2),
+        'p50': np.round(p50, 2),
+        'p90': np.round(p90, 2),
+        'full_probability': np.round(1.0 - normal_cdf((FULL_OCCUPANCY - occupancy) / np.maximum(scale, 1e-9)), 4),
+        'confidence': interval_confidence(p10, p90)
+    }
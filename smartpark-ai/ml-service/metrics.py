@@ -0,0 +1,184 @@
+"""Minimal Prometheus-style metrics (counters, gauges, histograms) with text exposition
+
+Each gunicorn worker keeps its own series; the `pid` label on
+smartpark_ml_process_info tells scrapes of different workers apart.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Latency buckets in seconds, from sub-millisecond table lookups to full retrains
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base for labelled metric families"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, **labels):
+        """Mirror a count that is maintained elsewhere (e.g. cache statistics)"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _render_series(self, key, series):
+        counts, total, count = series
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+        lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}')
+        lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class StageClock:
+    """Splits one request's time into consecutive stages without nesting the handler code
+
+    Each mark(stage) records the time since the previous mark (or since the
+    clock was created) under that stage.
+    """
+
+    def __init__(self, histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.histogram.observe(now - self.last, stage=stage, **self.labels)
+        self.last = now
+
+
+class MetricsRegistry:
+    """Metric families plus collectors that refresh gauges just before rendering"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """Register fn() to run before each render (usable as a decorator)"""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter('smartpark_ml_requests_total', 'HTTP requests handled', ('route', 'method', 'status'))
+REQUEST_SECONDS = registry.histogram('smartpark_ml_request_seconds', 'Request latency', ('route', 'method'))
+STAGE_SECONDS = registry.histogram('smartpark_ml_stage_seconds', 'Time spent in each request or model stage', ('route', 'stage'))
+BATCH_SIZE = registry.histogram('smartpark_ml_batch_size', 'Items per batch request', ('route',), SIZE_BUCKETS)
+MODEL_LOAD_SECONDS = registry.histogram('smartpark_ml_model_load_seconds', 'Time to load and publish a model version')
+TRAIN_SECONDS = registry.histogram('smartpark_ml_train_seconds', 'Time to train and publish a model version')
+MODEL_VERSION = registry.gauge('smartpark_ml_model_version', 'Model version being served')
+CACHE_HITS = registry.counter('smartpark_ml_cache_hits_total', 'Cache hits since the process started', ('cache',))
+CACHE_MISSES = registry.counter('smartpark_ml_cache_misses_total', 'Cache misses since the process started', ('cache',))
+CACHE_ENTRIES = registry.gauge('smartpark_ml_cache_entries', 'Entries currently cached', ('cache',))
+PROCESS_INFO = registry.gauge('smartpark_ml_process_info', 'Worker process serving this scrape', ('pid',))
+
+
+@registry.collector
+def _collect_process():
+    PROCESS_INFO.clear()
+    PROCESS_INFO.set(1, pid=os.getpid())
@@ -0,0 +1,275 @@
+"""Versioned on-disk registry for trained parking models"""
+import json
+import os
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import quote
+
+from compact_model import CompactModel
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+# Immutable pairing of a fitted model pipeline with everything derived from
+# it. Request handlers read the published snapshot once, so they never mix a
+# new model with an old lookup table.
+ModelSnapshot = namedtuple(
+    'ModelSnapshot',
+    ['version', 'model', 'table', 'metadata', 'routing'],
+    defaults=(None,)
+)
+
+# Routing for a version without slot/area-specific models
+EMPTY_ROUTING = {'slot_area': {}, 'zone_area': {}, 'models': {'slot': [], 'area': []}}
+
+
+def routed_model_key(routing, slot_id=None, zone_id=None, area=None):
+    """Most specific (kind, key) with a trained model, or None for the city-wide model
+
+    Slots fall back to their area's model; zones use the model of their area.
+    """
+    if slot_id is not None:
+        slot_id = int(slot_id)
+        if slot_id in routing['models']['slot']:
+            return ('slot', slot_id)
+        area = area or routing['slot_area'].get(slot_id)
+    if zone_id is not None and area is None:
+        area = routing['zone_area'].get(int(zone_id))
+    if area is not None and area in routing['models']['area']:
+        return ('area', area)
+    return None
+
+
+class ModelRegistry:
+    """Stores each trained model as models/parking_model.v{n}.json (+ .pkl)
+
+    models/registry.json lists every version with its metadata and records
+    which one is active, so a restart serves the same version and a bad
+    retrain can be rolled back. Slot- and area-specific models trained
+    alongside a version live under models/keyed/v{n}/ and are loaded on demand.
+
+    The .json artifact holds the model as a CompactModel and is all serving
+    reads; the .pkl keeps the full fitted pipeline for offline use.
+    """
+
+    def __init__(self, model_dir='models'):
+        self.model_dir = model_dir
+        self.index_path = os.path.join(model_dir, 'registry.json')
+        self._lock = threading.Lock()
+        self._first_version_lock = threading.Lock()
+
+    @contextmanager
+    def _file_locked(self, thread_lock, path):
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.model_dir, exist_ok=True)
+            with open(path, 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _locked(self):
+        """Serialize index updates across threads and, where supported, gunicorn workers"""
+        return self._file_locked(self._lock, self.index_path + '.lock')
+
+    def first_version_lock(self):
+        """Held while creating a version for an empty registry, so processes starting together create one
+
+        Separate from the index lock, which register() takes while this is held.
+        """
+        return self._file_locked(self._first_version_lock, self.index_path + '.first.lock')
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'active': None, 'versions': []}
+
+    def _write_index(self, index):
+        os.makedirs(self.model_dir, exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def artifact_path(self, version, suffix='.json'):
+        """Path of the compact (.json) or pickled (.pkl) artifact for a version"""
+        return os.path.join(self.model_dir, f'parking_model.v{version}{suffix}')
+
+    def keyed_path(self, version, kind, key, suffix='.json'):
+        """Path of the artifact for a slot/area-specific model of a version"""
+        return os.path.join(self.model_dir, 'keyed', f'v{version}', f"{kind}_{quote(str(key), safe='')}{suffix}")
+
+    @staticmethod
+    def _write_json(path, data):
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def _read_json(path):
+        with open(path) as f:
+            return json.load(f)
+
+    def register(self, model, metadata=None, keyed=None, routing=None):
+        """Persist a new version and return its metadata entry (not activated)
+
+        model is a fitted linear pipeline; keyed maps (kind, key) to
+        (model, metadata) for slot/area models; routing records the
+        slot/zone -> area mappings those models rely on.
+        """
+        import joblib
+
+        keyed = keyed or {}
+        routing = routing or EMPTY_ROUTING
+        with self._locked():
+            index = self._read_index()
+            version = max((v['version'] for v in index['versions']), default=0) + 1
+            entry = {
+                'version': version,
+                'created_at': datetime.now().isoformat(),
+                'keyed_models': len(keyed),
+                **(metadata or {})
+            }
+
+            for (kind, key), (keyed_model, keyed_metadata) in keyed.items():
+                path = self.keyed_path(version, kind, key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                compact = CompactModel.from_pipeline(keyed_model)
+                self._write_json(path, {'model': compact.to_dict(), 'metadata': keyed_metadata})
+
+            os.makedirs(self.model_dir, exist_ok=True)
+            path = self.artifact_path(version, '.pkl')
+            joblib.dump({'model': model, 'metadata': entry, 'routing': routing}, path + '.tmp')
+            os.replace(path + '.tmp', path)
+
+            compact = CompactModel.from_pipeline(model)
+            self._write_json(self.artifact_path(version), {
+                'model': compact.to_dict(),
+                'metadata': entry,
+                'routing': routing
+            })
+
+            index['versions'].append(entry)
+            self._write_index(index)
+        return entry
+
+    @staticmethod
+    def _unpickle(path):
+        """(CompactModel, artifact) from a pickled artifact written before the JSON format
+
+        Only this fallback imports joblib/scikit-learn; older artifacts may also
+        hold a separate scaler rather than a pipeline.
+        """
+        import joblib
+        from features import legacy_pipeline
+
+        artifact = joblib.load(path)
+        model = artifact['model']
+        if artifact.get('scaler') is not None:
+            model = legacy_pipeline(model, artifact['scaler'])
+        return CompactModel.from_pipeline(model), artifact
+
+    @staticmethod
+    def _routing(routing):
+        """Routing with integer slot/zone ids restored (JSON object keys are strings)"""
+        routing = routing or EMPTY_ROUTING
+        return {
+            'slot_area': {int(key): area for key, area in routing['slot_area'].items()},
+            'zone_area': {int(key): area for key, area in routing['zone_area'].items()},
+            'models': {
+                'slot': [int(key) for key in routing['models']['slot']],
+                'area': list(routing['models']['area'])
+            }
+        }
+
+    def load(self, version):
+        """Load (CompactModel, metadata, routing) for a registered version"""
+        if self.get(version) is None:
+            raise ValueError(f'Unknown model version: {version}')
+        path = self.artifact_path(version)
+        if os.path.exists(path):
+            artifact = self._read_json(path)
+            model = CompactModel.from_dict(artifact['model'])
+        else:
+            model, artifact = self._unpickle(self.artifact_path(version, '.pkl'))
+        return model, artifact['metadata'], self._routing(artifact.get('routing'))
+
+    def load_keyed(self, version, kind, key):
+        """Load (CompactModel, metadata, size in bytes) for a slot/area model"""
+        path = self.keyed_path(version, kind, key)
+        if os.path.exists(path):
+            artifact = self._read_json(path)
+            model = CompactModel.from_dict(artifact['model'])
+        else:
+            path = self.keyed_path(version, kind, key, '.pkl')
+            model, artifact = self._unpickle(path)
+        return model, artifact['metadata'], os.path.getsize(path)
+
+    def get(self, version):
+        """Metadata entry for a version, or None"""
+        for entry in self._read_index()['versions']:
+            if entry['version'] == version:
+                return entry
+        return None
+
+    def activate(self, version):
+        """Mark a registered version as the one to serve"""
+        with self._locked():
+            index = self._read_index()
+            if not any(v['version'] == version for v in index['versions']):
+                raise ValueError(f'Unknown model version: {version}')
+            index['active'] = version
+            self._write_index(index)
+
+    def annotate(self, version, **fields):
+        """Add fields to a registered version's metadata entry and return the entry"""
+        with self._locked():
+            index = self._read_index()
+            for entry in index['versions']:
+                if entry['version'] == version:
+                    entry.update(fields)
+                    self._write_index(index)
+                    return entry
+        raise ValueError(f'Unknown model version: {version}')
+
+    def check_promotion(self, version, tolerance=0.05, metric='mae'):
+        """(ok, reason): whether a version's backtest error is within tolerance of the active version's
+
+        Versions without a recorded backtest (either side) are not gated.
+        """
+        candidate = (self.get(version) or {}).get('backtest')
+        active_version = self.active_version()
+        active = (self.get(active_version) or {}).get('backtest') if active_version not in (None, version) else None
+        if candidate is None or active is None:
+            return True, 'no backtest to compare against'
+        limit = active[metric] * (1 + tolerance)
+        if candidate[metric] > limit:
+            return False, (f'backtest {metric} {candidate[metric]:.4f} exceeds version {active_version} '
+                           f'({active[metric]:.4f}) by more than {tolerance:.0%}')
+        return True, f'backtest {metric} {candidate[metric]:.4f} vs {active[metric]:.4f} for version {active_version}'
+
+    def active_version(self):
+        """Currently active version number, or None if nothing is registered"""
+        return self._read_index()['active']
+
+    def previous_version(self):
+        """Version registered immediately before the active one, or None"""
+        index = self._read_index()
+        versions = sorted(v['version'] for v in index['versions'])
+        older = [v for v in versions if index['active'] is not None and v < index['active']]
+        return older[-1] if older else None
+
+    def versions(self):
+        """All registered versions (oldest first) and the active version"""
+        index = self._read_index()
+        return index['versions'], index['active']
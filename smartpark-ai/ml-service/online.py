@@ -0,0 +1,188 @@
+"""Incremental updates from live occupancy observations
+
+Observations are queued by the request thread and folded into running
+per-(key, day, hour) statistics by a background worker, which periodically
+hands them to a publish callback. Serving blends each bucket's observed mean
+into the model's prediction with a prior weight:
+
+    occupancy = (prior_weight * predicted + sum_observed) / (prior_weight + count)
+
+so a bucket follows the model until it has seen about prior_weight reports
+and then increasingly tracks what users actually report, without a retrain.
+Each process learns from the observations it receives, which is why the
+service only enables this with a single worker; statistics start over
+whenever a new model version is published, since a retrain on the database
+history already includes the reports. Only occupancy is learned online;
+traffic predictions are not updated from observations.
+"""
+import threading
+import time
+
+import numpy as np
+
+from history import GLOBAL_KEY, BucketStats
+
+
+def blend_occupancy(predicted, count, total, prior_weight):
+    """Predicted occupancy shrunk towards observed bucket means"""
+    return (prior_weight * predicted + total) / (prior_weight + count)
+
+
+class OnlineLearner:
+    """Bounded observation queue drained into BucketStats by a worker thread
+
+    publish(learner) is called from the worker at most every `interval`
+    seconds when new observations have been applied.
+    """
+
+    def __init__(self, publish, max_pending=100000, interval=60.0):
+        self.publish = publish
+        self.max_pending = max_pending
+        self.interval = interval
+        self.stats = BucketStats()
+        self.published_rows = 0
+        self.published_at = None
+        self.dropped = 0
+        self._pending = []
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # flush() calls requested and completed; counted so no request can be missed
+        self._flush_requests = 0
+        self._flushes_done = 0
+        self._wake = threading.Condition(self._lock)
+        self._flushed = threading.Condition(self._lock)
+        self._thread = None
+
+    def submit(self, keys, hours, days, values):
+        """Queue a batch of observations; returns False (dropping it) when the queue is full"""
+        with self._lock:
+            if self._pending_count + len(values) > self.max_pending:
+                self.dropped += len(values)
+                return False
+            self._pending.append((keys, hours, days, values))
+            self._pending_count += len(values)
+            self._start()
+        return True
+
+    def _start(self):
+        # Started on first use so no thread exists in a gunicorn master before forking
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='online-learner', daemon=True)
+            self._thread.start()
+
+    def _drain(self):
+        with self._lock:
+            batches, self._pending, self._pending_count = self._pending, [], 0
+        if not batches:
+            return False
+        with self._stats_lock:
+            for batch in batches:
+                self.stats.update(*batch)
+        return True
+
+    def _publish(self):
+        self.publish(self)
+        self.published_rows = self.stats.rows_seen
+        self.published_at = time.time()
+
+    def _run(self):
+        last_publish = time.monotonic()
+        while True:
+            with self._lock:
+                if self._flush_requests == self._flushes_done:
+                    self._wake.wait(timeout=min(self.interval, 1.0))
+                requested = self._flush_requests
+            flush = requested != self._flushes_done
+            self._drain()
+            due = time.monotonic() - last_publish >= self.interval
+            if (flush or due) and self.stats.rows_seen != self.published_rows:
+                try:
+                    self._publish()
+                except Exception as e:
+                    print(f"⚠️  Online model update failed: {e}")
+                last_publish = time.monotonic()
+            if flush:
+                with self._lock:
+                    self._flushes_done = requested
+                    self._flushed.notify_all()
+
+    def flush(self, timeout=10.0):
+        """Apply queued observations and publish now; waits for the worker"""
+        with self._lock:
+            self._start()
+            self._flush_requests += 1
+            requested = self._flush_requests
+            self._wake.notify()
+            return self._flushed.wait_for(lambda: self._flushes_done >= requested, timeout)
+
+    def buckets(self, keys=None):
+        """(count, sum) arrays over the given keys, or over every key when keys is None"""
+        with self._stats_lock:
+            if keys is None:
+                count, total, _ = self.stats.buckets()
+            else:
+                count, total, _ = self.stats.pooled(keys)
+        return count, total
+
+    def reset(self):
+        """Forget applied statistics (a new model version was published)"""
+        with self._stats_lock:
+            self.stats = BucketStats()
+        self.published_rows = 0
+
+    def status(self):
+        with self._lock:
+            pending = self._pending_count
+        return {
+            'pending': pending,
+            'max_pending': self.max_pending,
+            'applied': self.stats.rows_seen,
+            'published': self.published_rows,
+            'published_at': self.published_at,
+            'dropped': self.dropped,
+            'keys': len([key for key in self.stats.keys if key != GLOBAL_KEY]),
+            'interval_seconds': self.interval
+        }
+
+
+def observation_arrays(observations, now, report_occupancy):
+    """(keys, hours, days, values) arrays for valid observations, plus indexes of rejected ones
+
+    Each observation has an occupancy_percentage (0-100) or a report_type
+    ('available', 'occupied', 'full'), an optional slot_id, and either hour
+    and day or an ISO timestamp (default: now).
+    """
+    keys, hours, days, values, rejected = [], [], [], [], []
+    for i, item in enumerate(observations):
+        if not isinstance(item, dict):
+            rejected.append(i)
+            continue
+        try:
+            if item.get('occupancy_percentage') is not None:
+                value = float(item['occupancy_percentage'])
+            else:
+                value = report_occupancy[item['report_type']]
+            if 'timestamp' in item:
+                ts = np.datetime64(item['timestamp'], 's').astype(object)
+                hour, day = ts.hour, ts.weekday()
+            else:
+                hour, day = int(item.get('hour', now.hour)), int(item.get('day', now.weekday()))
+            slot_id = int(item['slot_id']) if item.get('slot_id') is not None else GLOBAL_KEY
+        except (KeyError, TypeError, ValueError):
+            rejected.append(i)
+            continue
+        if not (0 <= value <= 100 and 0 <= hour <= 23 and 0 <= day <= 6):
+            rejected.append(i)
+            continue
+        keys.append(slot_id)
+        hours.append(hour)
+        days.append(day)
+        values.append(value)
+    arrays = (
+        np.array(keys, dtype=np.int64),
+        np.array(hours, dtype=np.int64),
+        np.array(days, dtype=np.int64),
+        np.array(values, dtype=float)
+    )
+    return arrays, rejected
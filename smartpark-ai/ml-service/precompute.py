@@ -0,0 +1,255 @@
+"""Materialize a full week of predictions into the backend's database
+
+Writes 168 (day, hour) rows per parking slot into `predictions` and per
+traffic zone into `traffic_predictions`, so the backend's fallback paths
+read precomputed values with indexed lookups while the ML service is down
+or busy. Work is split into one partition per area (its zones and slots);
+partitions run in a process pool, each loading the model itself and
+replacing its own rows (DELETE then batched multi-row INSERTs) in one
+transaction. Every row is tagged with the model version it came from;
+rows without one are history and are left alone.
+
+    python precompute.py --target mysql
+    python precompute.py --target sqlite:/tmp/smartpark.db --workers 4
+
+A SQLite target gets the two tables created if they are missing.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from geo import load_zone_rows
+from history import TABLE_SIZE, connect, iter_chunks
+from intervals import occupancy_intervals
+from model_registry import ModelRegistry, routed_model_key
+from traffic_model import predict_traffic_arrays
+
+PREDICTION_COLUMNS = [
+    'slot_id', 'predicted_occupancy', 'prediction_hour', 'day_of_week', 'confidence_score', 'model_version'
+]
+TRAFFIC_COLUMNS = [
+    'zone_id', 'latitude', 'longitude', 'predicted_congestion', 'predicted_speed', 'predicted_vehicle_count',
+    'prediction_hour', 'day_of_week', 'confidence_score', 'model_version'
+]
+
+# Tables for a SQLite stand-in (subset of database/schema.sql)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    slot_id INTEGER NOT NULL,
+    predicted_occupancy REAL NOT NULL,
+    prediction_hour INTEGER NOT NULL,
+    day_of_week INTEGER NOT NULL,
+    confidence_score REAL,
+    model_version INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_slot ON predictions (slot_id, day_of_week, prediction_hour);
+CREATE TABLE IF NOT EXISTS traffic_predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    zone_id INTEGER NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    predicted_congestion TEXT NOT NULL,
+    predicted_speed REAL,
+    predicted_vehicle_count INTEGER,
+    prediction_hour INTEGER NOT NULL,
+    day_of_week INTEGER NOT NULL,
+    confidence_score REAL,
+    model_version INTEGER,
+    prediction_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    valid_until TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_traffic_predictions_zone ON traffic_predictions (zone_id, day_of_week, prediction_hour);
+"""
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def load_slots(source):
+    """(slot_id, area) pairs for every parking slot; none if the table is missing"""
+    slots = []
+    try:
+        for chunk in iter_chunks(source, 'parking_slots', ['id', 'area']):
+            slots.extend((int(slot_id), area or None) for slot_id, area in chunk)
+    except (FileNotFoundError, sqlite3.OperationalError):
+        pass
+    return slots
+
+
+def partition_by_area(slots, zone_rows):
+    """{area: (slot_ids, zone_rows)}; slots and zones without an area share the None partition"""
+    partitions = {}
+    for slot_id, area in slots:
+        partitions.setdefault(area, ([], []))[0].append(slot_id)
+    for row in zone_rows:
+        partitions.setdefault(row[6] or None, ([], []))[1].append(row)
+    return partitions
+
+
+def occupancy_table(model):
+    """(occupancy, confidence) for all 168 (day, hour) buckets, indexed by day * 24 + hour"""
+    days, hours = np.divmod(np.arange(TABLE_SIZE), 24)
+    occupancy = np.clip(model.predict(np.column_stack((hours, days))), 0, 100)
+    return np.round(occupancy, 2), occupancy_intervals(occupancy, model.residual_scale)['confidence']
+
+
+def prediction_rows(registry, version, model, routing, slot_ids, area):
+    """predictions rows for each slot, evaluating each distinct model once"""
+    days, hours = np.divmod(np.arange(TABLE_SIZE), 24)
+    tables = {}
+    rows = []
+    for slot_id in slot_ids:
+        model_key = routed_model_key(routing, slot_id, area=area)
+        if model_key not in tables:
+            keyed = model if model_key is None else registry.load_keyed(version, *model_key)[0]
+            tables[model_key] = occupancy_table(keyed)
+        occupancy, confidence = tables[model_key]
+        rows.extend(zip(
+            [slot_id] * TABLE_SIZE, occupancy.tolist(), hours.tolist(), days.tolist(),
+            confidence.tolist(), [version] * TABLE_SIZE
+        ))
+    return rows
+
+
+def traffic_rows(version, zone_rows):
+    """traffic_predictions rows for every zone, from one traffic model call"""
+    if not zone_rows:
+        return []
+    zone_ids = np.repeat([int(row[0]) for row in zone_rows], TABLE_SIZE)
+    lats = np.repeat([float(row[3]) for row in zone_rows], TABLE_SIZE)
+    lngs = np.repeat([float(row[4]) for row in zone_rows], TABLE_SIZE)
+    days, hours = np.divmod(np.tile(np.arange(TABLE_SIZE), len(zone_rows)), 24)
+    traffic = predict_traffic_arrays(hours, days, lats, lngs, zone_ids)
+    return list(zip(
+        zone_ids.tolist(), lats.tolist(), lngs.tolist(), traffic['level'].tolist(),
+        np.round(traffic['speed'], 2).tolist(), traffic['vehicles'].tolist(),
+        hours.tolist(), days.tolist(), traffic['confidence'].tolist(), [version] * len(zone_ids)
+    ))
+
+
+def replace_rows(conn, table, key_column, keys, columns, rows, batch_size):
+    """Delete a table's model-written rows for the given keys and insert the new ones, batch_size rows per statement
+
+    Rows without a model_version were not written here (training reads them
+    as history) and are kept.
+    """
+    placeholder = '?' if isinstance(conn, sqlite3.Connection) else '%s'
+    cursor = conn.cursor()
+    for start in range(0, len(keys), batch_size):
+        chunk = keys[start:start + batch_size]
+        cursor.execute(
+            f"DELETE FROM {table} WHERE {key_column} IN ({', '.join([placeholder] * len(chunk))}) "
+            "AND model_version IS NOT NULL",
+            chunk
+        )
+    row_values = f"({', '.join([placeholder] * len(columns))})"
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([row_values] * len(batch))}",
+            [value for row in batch for value in row]
+        )
+    cursor.close()
+
+
+def precompute_partition(model_dir, version, target, area, slot_ids, zone_rows, batch_size):
+    """Compute and write one partition's rows; returns (area, slot rows, zone rows)"""
+    registry = ModelRegistry(model_dir)
+    model, _, routing = registry.load(version)
+    predictions = prediction_rows(registry, version, model, routing, slot_ids, area)
+    traffic = traffic_rows(version, zone_rows)
+
+    conn = connect(target)
+    try:
+        if isinstance(conn, sqlite3.Connection):
+            # Partitions write concurrently; wait for the lock instead of failing
+            conn.execute('PRAGMA busy_timeout = 60000')
+        replace_rows(conn, 'predictions', 'slot_id', slot_ids, PREDICTION_COLUMNS, predictions, batch_size)
+        zone_ids = [int(row[0]) for row in zone_rows]
+        replace_rows(conn, 'traffic_predictions', 'zone_id', zone_ids, TRAFFIC_COLUMNS, traffic, batch_size)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return area, len(predictions), len(traffic)
+
+
+def precompute(target, zones_source=None, model_dir='models', version=None, workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Write predictions for every slot and zone in `target`; returns a summary dict"""
+    registry = ModelRegistry(model_dir)
+    version = version or registry.active_version()
+    if version is None:
+        raise ValueError(f'No active model in {model_dir}; train one first')
+
+    if target.startswith('sqlite:'):
+        conn = connect(target)
+        conn.executescript(SQLITE_SCHEMA)
+        conn.close()
+
+    slots = load_slots(target)
+    try:
+        zone_rows = load_zone_rows(zones_source or target)
+    except (FileNotFoundError, sqlite3.OperationalError) as e:
+        raise ValueError(
+            f'Could not read traffic zones from {zones_source or target} ({e}); '
+            "pass --zones with a source that has them, e.g. --zones seed"
+        ) from None
+    partitions = partition_by_area(slots, zone_rows)
+
+    start = time.perf_counter()
+    slot_rows = zone_row_count = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(precompute_partition, model_dir, version, target, area, slot_ids, zones, batch_size)
+            for area, (slot_ids, zones) in partitions.items()
+        ]
+        for future in futures:
+            area, written_slots, written_zones = future.result()
+            slot_rows += written_slots
+            zone_row_count += written_zones
+            print(f"✅ {area or 'no area'}: {written_slots} slot rows, {written_zones} zone rows")
+
+    return {
+        'model_version': version,
+        'partitions': len(partitions),
+        'slots': len(slots),
+        'zones': len(zone_rows),
+        'prediction_rows': slot_rows,
+        'traffic_prediction_rows': zone_row_count,
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', default=os.environ.get('PRECOMPUTE_TARGET', 'mysql'),
+                        help="database to write: 'mysql' or 'sqlite:<path>'")
+    parser.add_argument('--zones', default=None,
+                        help="traffic zone source (default: the target database; see ZONES_SOURCE)")
+    parser.add_argument('--model-dir', default=os.environ.get('MODEL_DIR', 'models'))
+    parser.add_argument('--version', type=int, default=None, help='model version (default: the active one)')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='rows per INSERT statement')
+    args = parser.parse_args(argv)
+
+    try:
+        summary = precompute(args.target, args.zones, args.model_dir, args.version, args.workers, args.batch_size)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ Wrote {summary['prediction_rows']} predictions and {summary['traffic_prediction_rows']} "
+          f"traffic predictions for model version {summary['model_version']} in {summary['seconds']}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
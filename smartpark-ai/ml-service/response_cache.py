@@ -0,0 +1,247 @@
+"""Result cache for prediction endpoints, expiring at the next hour boundary
+
+Predictions only change when the clock crosses an hour or a new model is
+published, so endpoint results are cached under their normalized parameters
+and the model version, with a TTL that runs out at the top of the hour.
+
+Backends:
+    'memory'          - per-process LRU (the default)
+    'sqlite:<path>'   - LRU in a local SQLite file shared by every worker on
+                        the host; also a stand-in for a shared store in tests
+    'redis://...'     - shared Redis store (needs the optional redis package)
+    'off'             - no caching
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+
+def seconds_until_next_hour(now=None):
+    """Seconds from now until the top of the next hour"""
+    now = now or datetime.now()
+    next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return max((next_hour - now).total_seconds(), 1.0)
+
+
+class MemoryBackend:
+    """In-process LRU of (expires_at, value) with a maximum entry count"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SqliteBackend:
+    """LRU in a SQLite file, shared by all processes that open the same path"""
+
+    name = 'sqlite'
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self.evictions = 0
+        # Created on a throwaway connection so none is inherited by forked workers
+        conn = sqlite3.connect(path, timeout=5)
+        with conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS response_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS response_cache_used_at ON response_cache (used_at)')
+        conn.close()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT value FROM response_cache WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE response_cache SET used_at = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO response_cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), now + ttl, now)
+            )
+            conn.execute('DELETE FROM response_cache WHERE expires_at <= ?', (now,))
+            evicted = conn.execute(
+                'DELETE FROM response_cache WHERE key IN ('
+                'SELECT key FROM response_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            ).rowcount
+            self.evictions += max(evicted, 0)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM response_cache')
+
+    def size(self):
+        return self._connect().execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+
+
+class RedisBackend:
+    """Shared Redis store; Redis handles expiry and LRU eviction (maxmemory-policy)"""
+
+    name = 'redis'
+
+    def __init__(self, url, prefix='smartpark:ml:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError('RESPONSE_CACHE=redis://... requires the redis package') from e
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(int(ttl), 1))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*', count=500))
+        if keys:
+            self.client.delete(*keys)
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + '*', count=500))
+
+
+def make_backend(spec, max_entries):
+    """Backend for a RESPONSE_CACHE setting, or None when caching is off"""
+    if spec in ('', 'off', 'none'):
+        return None
+    if spec == 'memory':
+        return MemoryBackend(max_entries)
+    if spec.startswith('sqlite:'):
+        return SqliteBackend(spec[len('sqlite:'):], max_entries)
+    if spec.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(spec)
+    raise ValueError(f'Unknown response cache backend: {spec}')
+
+
+class ResponseCache:
+    """Endpoint results keyed on (endpoint, model version, normalized parameters)
+
+    Backend errors are treated as misses so a broken shared store degrades to
+    recomputing instead of failing requests.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @staticmethod
+    def key(endpoint, version, params):
+        """Stable key for an endpoint call"""
+        return f"{endpoint}:v{version}:{json.dumps(params, sort_keys=True, separators=(',', ':'))}"
+
+    def get(self, endpoint, version, params):
+        """Cached result for the call, or None on a miss"""
+        if self.backend is None:
+            return None
+        try:
+            value = self.backend.get(self.key(endpoint, version, params))
+        except Exception:
+            self.errors += 1
+            value = None
+        if value is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def set(self, endpoint, version, params, value):
+        """Store a result until the next hour boundary"""
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(self.key(endpoint, version, params), value, seconds_until_next_hour())
+        except Exception:
+            self.errors += 1
+
+    def get_or_build(self, endpoint, version, params, build):
+        """Cached result for the call, or build() stored until the next hour boundary"""
+        value = self.get(endpoint, version, params)
+        if value is None:
+            value = build()
+            self.set(endpoint, version, params, value)
+        return value
+
+    def clear(self):
+        """Drop every cached result (after a new model is published)"""
+        if self.backend is None:
+            return
+        try:
+            self.backend.clear()
+        except Exception:
+            self.errors += 1
+
+    def stats(self):
+        """Backend, size and hit/miss counters for this process"""
+        if self.backend is None:
+            return {'backend': 'off'}
+        try:
+            entries = self.backend.size()
+        except Exception:
+            entries = None
+        return {
+            'backend': self.backend.name,
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions,
+            'errors': self.errors
+        }
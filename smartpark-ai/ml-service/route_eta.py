@@ -0,0 +1,112 @@
+"""Travel time estimates along routes, driven by the traffic model
+
+Waypoints of any number of routes are passed as concatenated arrays with a
+route index per waypoint. Segment lengths are computed for all routes at
+once; travel is then simulated one segment position at a time (vectorized
+across routes), so each segment's speed comes from the traffic model at the
+hour the vehicle actually reaches it rather than at the departure hour.
+"""
+import numpy as np
+
+from geo import haversine_m
+from traffic_model import predict_traffic_arrays
+
+# Straight-line distance understates distance by road; typical urban detour ratio
+ROAD_DISTANCE_FACTOR = 1.3
+
+HOURS_PER_WEEK = 7 * 24
+
+
+def week_hour(hour, day, minute=0):
+    """Fractional hour of the week (Monday 00:00 = 0)"""
+    return np.asarray(day, dtype=float) * 24 + np.asarray(hour, dtype=float) + np.asarray(minute, dtype=float) / 60
+
+
+def split_week_hour(t):
+    """(hour, day) integer arrays for fractional hours of the week"""
+    whole = np.floor(t).astype(np.int64) % HOURS_PER_WEEK
+    days, hours = np.divmod(whole, 24)
+    return hours, days
+
+
+def _traffic_at(t, lats, lngs, zone_ids, noise, seed):
+    hours, days = split_week_hour(t)
+    return predict_traffic_arrays(hours, days, lats, lngs, zone_ids, noise, seed)
+
+
+def estimate_routes(route_ids, lats, lngs, zone_ids, departures, noise='hashed', seed=None):
+    """Per-segment and per-route travel estimates
+
+    route_ids gives the route (0..R-1, non-decreasing) of each waypoint and
+    departures the departure time of each route as a fractional hour of the
+    week. Each segment is driven in two halves: the first at the speed near
+    its start waypoint when the vehicle gets there, the second at the speed
+    near its end waypoint half-way through.
+
+    Returns (segments, routes): dicts of equal-length arrays.
+    """
+    route_ids = np.asarray(route_ids, dtype=np.int64)
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    zone_ids = np.asarray([np.nan if zone_id is None else zone_id for zone_id in zone_ids], dtype=float)
+    departures = np.asarray(departures, dtype=float)
+    route_count = len(departures)
+
+    # Consecutive waypoints of the same route form a segment
+    starts = np.flatnonzero(route_ids[1:] == route_ids[:-1])
+    ends = starts + 1
+    segment_routes = route_ids[starts]
+    first_waypoint = np.searchsorted(route_ids, np.arange(route_count))
+    positions = starts - first_waypoint[segment_routes]
+
+    distance_m = haversine_m(lats[starts], lngs[starts], lats[ends], lngs[ends]) * ROAD_DISTANCE_FACTOR
+    half_km = distance_m / 2000
+
+    segment_count = len(starts)
+    depart = np.empty(segment_count)
+    hours_driven = np.empty(segment_count)
+    congestion = np.empty(segment_count)
+    level = np.empty(segment_count, dtype=object)
+
+    clock = departures.copy()
+    for position in range(int(positions.max()) + 1 if segment_count else 0):
+        segments = np.flatnonzero(positions == position)
+        routes = segment_routes[segments]
+        first, second = starts[segments], ends[segments]
+
+        t = clock[routes]
+        near_start = _traffic_at(t, lats[first], lngs[first], zone_ids[first], noise, seed)
+        first_half = half_km[segments] / near_start['speed']
+        near_end = _traffic_at(t + first_half, lats[second], lngs[second], zone_ids[second], noise, seed)
+        second_half = half_km[segments] / near_end['speed']
+
+        depart[segments] = t
+        hours_driven[segments] = first_half + second_half
+        congestion[segments] = (near_start['congestion'] * first_half + near_end['congestion'] * second_half) / hours_driven[segments]
+        level[segments] = np.where(near_end['congestion'] > near_start['congestion'], near_end['level'], near_start['level'])
+        clock[routes] = t + hours_driven[segments]
+
+    total_km = np.bincount(segment_routes, weights=distance_m / 1000, minlength=route_count)
+    total_hours = clock - departures
+    weighted_congestion = np.bincount(segment_routes, weights=congestion * hours_driven, minlength=route_count)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        segments = {
+            'route': segment_routes,
+            'from_waypoint': positions,
+            'to_waypoint': positions + 1,
+            'distance_km': distance_m / 1000,
+            'depart': depart,
+            'duration_minutes': hours_driven * 60,
+            'avg_speed_kmh': np.where(hours_driven > 0, distance_m / 1000 / hours_driven, 0.0),
+            'congestion': congestion,
+            'level': level
+        }
+        routes = {
+            'distance_km': total_km,
+            'eta_minutes': total_hours * 60,
+            'arrival': clock,
+            'avg_speed_kmh': np.where(total_hours > 0, total_km / total_hours, 0.0),
+            'congestion': np.where(total_hours > 0, weighted_congestion / total_hours, 0.0)
+        }
+    return segments, routes
@@ -0,0 +1,56 @@
+"""Startup timing report: how long each import group and init step took
+
+Import this module first; steps are measured from then on with mark(), or
+with step() around a block, and report() lists them in order.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    """Ordered (step, seconds) timings for process startup"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.steps = []
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        """Record the time since the previous mark (or since import) as a step"""
+        now = time.perf_counter()
+        with self._lock:
+            self.steps.append((name, now - self.last))
+            self.last = now
+
+    @contextmanager
+    def step(self, name):
+        """Record the time spent inside the block as a step"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.steps.append((name, time.perf_counter() - start))
+                self.last = time.perf_counter()
+
+    def report(self):
+        """Steps in the order they ran, in milliseconds"""
+        with self._lock:
+            steps = list(self.steps)
+        return {
+            'pid': os.getpid(),
+            'total_ms': round(sum(seconds for _, seconds in steps) * 1000, 1),
+            'steps': [{'step': name, 'ms': round(seconds * 1000, 1)} for name, seconds in steps]
+        }
+
+    def log(self):
+        report = self.report()
+        print(f"⏱️  Startup took {report['total_ms']} ms (pid {report['pid']})")
+        for step in report['steps']:
+            print(f"   {step['step']:<28} {step['ms']:>9.1f} ms")
+
+
+startup_profile = StartupProfile()
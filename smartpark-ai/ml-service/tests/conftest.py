@@ -0,0 +1,39 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# The service is a flat set of modules run from ml-service/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from precompute import SQLITE_SCHEMA  # noqa: E402
+
+
+@pytest.fixture
+def history_db(tmp_path):
+    """SQLite stand-in with parking_slots, reports and predictions rows"""
+    path = tmp_path / 'smartpark.db'
+    conn = sqlite3.connect(path)
+    conn.executescript(SQLITE_SCHEMA)
+    conn.executescript("""
+        CREATE TABLE parking_slots (id INTEGER PRIMARY KEY, area TEXT);
+        CREATE TABLE reports (id INTEGER PRIMARY KEY, slot_id INTEGER, timestamp TEXT, report_type TEXT, status TEXT);
+    """)
+    conn.executemany('INSERT INTO parking_slots (id, area) VALUES (?, ?)', [(1, 'Bandra'), (2, None)])
+    # 2024-01-01 was a Monday (day 0)
+    conn.executemany('INSERT INTO reports (slot_id, timestamp, report_type, status) VALUES (?, ?, ?, ?)', [
+        (1, '2024-01-01 09:15:00', 'full', 'verified'),
+        (1, '2024-01-08 09:45:00', 'available', 'pending'),
+        (1, '2024-01-08 09:50:00', 'occupied', 'rejected'),
+        (1, '2024-01-08 09:55:00', 'unknown', 'verified'),
+        (None, '2024-01-03 18:00:00', 'occupied', 'verified')
+    ])
+    conn.executemany(
+        'INSERT INTO predictions (slot_id, predicted_occupancy, prediction_hour, day_of_week, model_version) '
+        'VALUES (?, ?, ?, ?, ?)',
+        [(2, 60.0, 10, 2, None), (2, 99.0, 10, 2, 3)]
+    )
+    conn.commit()
+    conn.close()
+    return f'sqlite:{path}'
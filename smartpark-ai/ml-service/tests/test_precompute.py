@@ -0,0 +1,52 @@
+"""precompute.py writing into a SQLite stand-in"""
+import sqlite3
+
+import numpy as np
+
+from geo import parse_seed_zones
+from history import TABLE_SIZE
+from model_registry import ModelRegistry
+from precompute import occupancy_table, precompute
+from training import fit_buckets
+
+
+def test_precompute_replaces_rows(history_db, tmp_path):
+    registry = ModelRegistry(str(tmp_path / 'models'))
+    days, hours = np.divmod(np.arange(TABLE_SIZE), 24)
+    occupancy = 40 + 30 * np.sin(hours / 24 * 2 * np.pi) + 5 * (days >= 5)
+    count = np.full(TABLE_SIZE, 10.0)
+    pipeline, metrics = fit_buckets(count, occupancy * count, occupancy ** 2 * count + count)
+    version = registry.register(pipeline, metrics)['version']
+    registry.activate(version)
+
+    zone_count = len(parse_seed_zones())
+    db_path = history_db[len('sqlite:'):]
+    for _ in range(2):
+        summary = precompute(history_db, 'seed', registry.model_dir, workers=1, batch_size=100)
+        assert summary['prediction_rows'] == 2 * TABLE_SIZE
+        assert summary['traffic_prediction_rows'] == zone_count * TABLE_SIZE
+
+        # A second run replaces the rows instead of adding to them
+        conn = sqlite3.connect(db_path)
+        model_rows = conn.execute(
+            'SELECT slot_id, day_of_week, prediction_hour, predicted_occupancy FROM predictions '
+            'WHERE model_version = ? ORDER BY slot_id, day_of_week, prediction_hour', (version,)
+        ).fetchall()
+        history_rows = conn.execute(
+            'SELECT slot_id, predicted_occupancy FROM predictions WHERE model_version IS NULL'
+        ).fetchall()
+        stale_rows = conn.execute('SELECT COUNT(*) FROM predictions WHERE model_version <> ?', (version,)).fetchone()
+        traffic_rows = conn.execute(
+            'SELECT COUNT(*), COUNT(DISTINCT zone_id) FROM traffic_predictions WHERE model_version = ?', (version,)
+        ).fetchone()
+        conn.close()
+
+        assert len(model_rows) == 2 * TABLE_SIZE
+        assert traffic_rows == (zone_count * TABLE_SIZE, zone_count)
+        # Rows from other model versions are replaced; history rows are kept
+        assert stale_rows == (0,)
+        assert history_rows == [(2, 60.0)]
+
+    expected, _ = occupancy_table(registry.load(version)[0])
+    slot_1 = np.array([row[3] for row in model_rows if row[0] == 1])
+    assert np.allclose(slot_1, expected)
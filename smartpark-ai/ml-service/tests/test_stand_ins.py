@@ -0,0 +1,77 @@
+"""Streaming history from SQLite and CSV stand-ins into bucket sums"""
+import csv
+
+import numpy as np
+import pytest
+
+from history import aggregate_history, iter_table_chunks
+
+
+def test_history_bucket_sums(history_db):
+    stats = aggregate_history(history_db, ['reports', 'predictions'], chunk_size=2)
+
+    # Rejected reports, unknown report types and model-written predictions are skipped
+    assert stats.rows_seen == 4
+
+    count, total, total_sq = stats.buckets(1)
+    monday_9 = 0 * 24 + 9
+    assert count[monday_9] == 2
+    assert total[monday_9] == 100.0 + 35.0
+    assert total_sq[monday_9] == 100.0 ** 2 + 35.0 ** 2
+    assert count.sum() == 2
+
+    count, total, _ = stats.buckets(2)
+    assert count[2 * 24 + 10] == 1
+    assert total[2 * 24 + 10] == 60.0
+
+    count, total, _ = stats.buckets(-1)
+    assert count[2 * 24 + 18] == 1
+    assert total[2 * 24 + 18] == 80.0
+
+
+def write_csv(path, header, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+@pytest.fixture
+def history_csv(tmp_path):
+    """CSV exports holding the same rows as the history_db fixture"""
+    write_csv(tmp_path / 'reports.csv', ['id', 'slot_id', 'timestamp', 'report_type', 'status'], [
+        (1, 1, '2024-01-01 09:15:00', 'full', 'verified'),
+        (2, 1, '2024-01-08 09:45:00', 'available', 'pending'),
+        (3, 1, '2024-01-08 09:50:00', 'occupied', 'rejected'),
+        (4, 1, '2024-01-08 09:55:00', 'unknown', 'verified'),
+        (5, '', '2024-01-03 18:00:00', 'occupied', 'verified')
+    ])
+    write_csv(tmp_path / 'predictions.csv',
+              ['id', 'slot_id', 'predicted_occupancy', 'prediction_hour', 'day_of_week', 'model_version'], [
+                  (1, 2, 60.0, 10, 2, ''),
+                  (2, 2, 99.0, 10, 2, 3)
+              ])
+    return f'csv:{tmp_path}'
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1000])
+def test_chunked_sources_agree(history_db, history_csv, chunk_size):
+    expected = aggregate_history(history_db, ['reports', 'predictions'], chunk_size=1000)
+    for source in (history_db, history_csv):
+        stats = aggregate_history(source, ['reports', 'predictions'], chunk_size=chunk_size)
+        assert stats.rows_seen == expected.rows_seen == 4
+        assert sorted(stats.keys) == sorted(expected.keys) == [-1, 1, 2]
+        for key in expected.keys:
+            for got, want in zip(stats.buckets(key), expected.buckets(key)):
+                assert np.array_equal(got, want)
+
+
+def test_iter_table_chunks_sizes(history_csv):
+    chunks = list(iter_table_chunks(history_csv, 'reports', chunk_size=2))
+    # Rejected reports are filtered before chunking, as the SQL WHERE clause would
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+
+
+def test_unknown_history_table(history_db):
+    with pytest.raises(ValueError, match='traffic_history'):
+        aggregate_history(history_db, ['traffic_history'])
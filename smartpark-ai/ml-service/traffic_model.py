@@ -0,0 +1,136 @@
+"""Vectorized traffic congestion model shared by all traffic endpoints
+
+Congestion, speed and vehicle counts follow the hour-of-day pattern the
+service has always used (peak, lunch, night and regular hours, with a
+weekend discount), computed for whole arrays of (hour, day, location) at once.
+
+The per-item variation is controlled by `noise`:
+    'hashed' - pseudo-random but derived from the inputs, so identical requests
+               always get identical answers (the default)
+    'none'   - no variation, the pattern means only
+    'random' - fresh draws from a generator seeded with `seed`
+"""
+import numpy as np
+
+from intervals import interval_confidence, quantiles
+
+NOISE_MODES = ('hashed', 'none', 'random')
+
+PEAK_HOURS = [8, 9, 10, 17, 18, 19, 20]
+LUNCH_HOURS = [12, 13, 14]
+
+# Mean and standard deviation per hour bucket: peak, lunch, night, regular
+CONGESTION_MEAN = np.array([80.0, 60.0, 25.0, 50.0])
+CONGESTION_STD = np.array([5.0, 5.0, 5.0, 5.0])
+SPEED_MEAN = np.array([15.0, 28.0, 45.0, 32.0])
+SPEED_STD = np.array([3.0, 4.0, 5.0, 4.0])
+VEHICLES_MEAN = np.array([450.0, 300.0, 150.0, 280.0])
+VEHICLES_STD = np.array([50.0, 40.0, 30.0, 35.0])
+
+PEAK, LUNCH, NIGHT, REGULAR = range(4)
+
+
+def hour_buckets(hours):
+    """Bucket index (PEAK, LUNCH, NIGHT, REGULAR) for each hour"""
+    return np.select(
+        [np.isin(hours, PEAK_HOURS), np.isin(hours, LUNCH_HOURS), (hours >= 22) | (hours <= 6)],
+        [PEAK, LUNCH, NIGHT],
+        default=REGULAR
+    )
+
+
+def _mix(x):
+    """splitmix64 finalizer over a uint64 array"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _hashed_normals(keys, count):
+    """`count` standard normal arrays derived deterministically from uint64 keys"""
+    normals = []
+    for stream in range(count):
+        h1 = _mix(keys + np.uint64(2 * stream + 1))
+        h2 = _mix(h1 ^ np.uint64(0x9E3779B97F4A7C15))
+        # Map the top 53 bits to (0, 1) and apply Box-Muller
+        u1 = ((h1 >> np.uint64(11)).astype(np.float64) + 0.5) * 2.0 ** -53
+        u2 = ((h2 >> np.uint64(11)).astype(np.float64) + 0.5) * 2.0 ** -53
+        normals.append(np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2))
+    return normals
+
+
+def _input_keys(hours, days, lats, lngs, zone_ids, seed):
+    """One uint64 hash per item from its time, location and zone"""
+    with np.errstate(over='ignore'):
+        keys = _mix(np.asarray(hours + 24 * days, dtype=np.uint64) ^ np.uint64(seed or 0))
+        keys = _mix(keys + zone_ids.astype(np.int64).astype(np.uint64))
+        # Locations are quantized to ~10 m so float formatting doesn't change the answer
+        keys = _mix(keys + np.round(np.nan_to_num(lats) * 1e4).astype(np.int64).astype(np.uint64))
+        keys = _mix(keys + np.round(np.nan_to_num(lngs) * 1e4).astype(np.int64).astype(np.uint64))
+    return keys
+
+
+def _as_float_array(values, size):
+    """Broadcast None, a scalar or a sequence with None entries to a float array (None -> NaN)"""
+    if values is None:
+        return np.full(size, np.nan)
+    return np.broadcast_to(np.array(values, dtype=float), (size,))
+
+
+def predict_traffic_arrays(hours, days, lats=None, lngs=None, zone_ids=None, noise='hashed', seed=None):
+    """Predict congestion, speed and vehicle counts for arrays of inputs in one pass
+
+    Returns a dict of equal-length arrays: congestion, level, speed, vehicles,
+    confidence, and congestion_p10/p50/p90 of the distribution the
+    congestion is drawn from.
+    """
+    if noise not in NOISE_MODES:
+        raise ValueError(f"noise must be one of {', '.join(NOISE_MODES)}")
+
+    hours = np.asarray(hours, dtype=np.int64)
+    days = np.asarray(days, dtype=np.int64)
+    size = hours.shape[0]
+    buckets = hour_buckets(hours)
+
+    if noise == 'none':
+        congestion_noise = speed_noise = vehicle_noise = np.zeros(size)
+    elif noise == 'random':
+        rng = np.random.default_rng(seed)
+        congestion_noise, speed_noise, vehicle_noise = rng.standard_normal((3, size))
+    else:
+        zones = np.nan_to_num(_as_float_array(zone_ids, size), nan=-1)
+        keys = _input_keys(hours, days, _as_float_array(lats, size), _as_float_array(lngs, size), zones, seed)
+        congestion_noise, speed_noise, vehicle_noise = _hashed_normals(keys, 3)
+
+    congestion = CONGESTION_MEAN[buckets] + CONGESTION_STD[buckets] * congestion_noise
+    speed = SPEED_MEAN[buckets] + SPEED_STD[buckets] * speed_noise
+    vehicles = np.trunc(VEHICLES_MEAN[buckets] + VEHICLES_STD[buckets] * vehicle_noise)
+
+    peak = buckets == PEAK
+    level = np.select(
+        [peak & (congestion < 85), peak, buckets == NIGHT],
+        ['high', 'critical', 'low'],
+        default='medium'
+    ).astype(object)
+
+    # Weekend adjustment (Saturday=5, Sunday=6)
+    weekend = days >= 5
+    congestion = np.where(weekend, congestion * 0.75, congestion)
+    speed = np.where(weekend, speed * 1.2, speed)
+    vehicles = np.where(weekend, np.trunc(vehicles * 0.7), vehicles)
+    level[weekend & (congestion < 40)] = 'low'
+    level[weekend & (congestion >= 40) & (congestion < 65)] = 'medium'
+
+    factor = np.where(weekend, 0.75, 1.0)
+    p10, p50, p90 = quantiles(CONGESTION_MEAN[buckets] * factor, CONGESTION_STD[buckets] * factor)
+
+    return {
+        'congestion': np.clip(congestion, 0, 100),
+        'level': level,
+        'speed': np.clip(speed, 5, 60),
+        'vehicles': np.maximum(vehicles, 0).astype(np.int64),
+        'confidence': interval_confidence(p10, p90),
+        'congestion_p10': np.round(p10, 2),
+        'congestion_p50': np.round(p50, 2),
+        'congestion_p90': np.round(p90, 2)
+    }
@@ -0,0 +1,157 @@
+"""Training pipeline for the parking occupancy model"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from features import make_pipeline
+from history import GLOBAL_KEY, TABLE_SIZE, BucketStats, aggregate_history, load_area_mappings
+from intervals import residual_scale
+
+# Where training rows come from: unset for synthetic data, otherwise
+# 'mysql', 'sqlite:<path>' or 'csv:<directory>'
+HISTORY_SOURCE = os.environ.get('HISTORY_SOURCE', '')
+HISTORY_TABLES = os.environ.get('HISTORY_TABLES', 'reports,predictions').split(',')
+HISTORY_CHUNK_SIZE = int(os.environ.get('HISTORY_CHUNK_SIZE', 50000))
+
+# Passes of partial_fit over the aggregated buckets
+TRAINING_EPOCHS = 200
+
+# Minimum rows of history before a slot or area gets its own model
+MIN_KEYED_SAMPLES = int(os.environ.get('MIN_KEYED_SAMPLES', 500))
+
+
+def generate_sample_data(weeks=1):
+    """Generate sample parking occupancy data for training, one row per hour for `weeks` weeks"""
+    np.random.seed(42)
+
+    # Generate data for whole weeks (7 days, 24 hours), oldest first
+    days, hours = np.divmod(np.arange(TABLE_SIZE * weeks) % TABLE_SIZE, 24)
+
+    # Peak hours (8-10 AM, 5-8 PM): 80-95% occupancy
+    # Lunch hours (12-2 PM): 70-85% occupancy
+    # Night hours (10 PM - 6 AM): 20-40% occupancy
+    # Regular hours: 50-70% occupancy
+    base = np.select(
+        [np.isin(hours, [8, 9, 10, 17, 18, 19, 20]), np.isin(hours, [12, 13, 14]), (hours >= 22) | (hours <= 6)],
+        [85, 75, 30],
+        default=60
+    )
+    occupancy = base + np.random.normal(0, 5, TABLE_SIZE * weeks)
+
+    # Weekend adjustment (Saturday=5, Sunday=6): 20% less on weekends
+    occupancy = np.where(days >= 5, occupancy * 0.8, occupancy)
+
+    # Ensure occupancy is between 0 and 100
+    return pd.DataFrame({
+        'hour': hours,
+        'day_of_week': days,
+        'occupancy': np.clip(occupancy, 0, 100)
+    })
+
+
+def sample_stats():
+    """Bucket statistics for the synthetic training data"""
+    df = generate_sample_data()
+    stats = BucketStats()
+    stats.update(
+        np.full(len(df), GLOBAL_KEY),
+        df['hour'].to_numpy(),
+        df['day_of_week'].to_numpy(),
+        df['occupancy'].to_numpy(dtype=float)
+    )
+    return stats
+
+
+def load_training_stats(source=None):
+    """Aggregate training data from the configured history source (synthetic if unset)"""
+    source = HISTORY_SOURCE if source is None else source
+    if not source:
+        return sample_stats(), 'synthetic'
+    return aggregate_history(source, HISTORY_TABLES, HISTORY_CHUNK_SIZE), source
+
+
+def fit_buckets(count, total, total_sq):
+    """Fit the feature pipeline on per-(day, hour) bucket means, weighted by bucket size
+
+    The pipeline also gets residual_scale_, the per-bucket residual spread
+    used for prediction intervals. Returns (pipeline, metrics).
+    """
+    mask = count > 0
+    if not mask.any():
+        raise ValueError('No training data')
+
+    days, hours = np.divmod(np.arange(TABLE_SIZE), 24)
+    X = np.column_stack((hours, days))[mask].astype(float)
+    y = total[mask] / count[mask]
+    weights = count[mask] / count[mask].mean()
+
+    pipeline = make_pipeline()
+    X_scaled = pipeline[:-1].fit_transform(X, y, scaler__sample_weight=weights)
+
+    # The regressor is fitted incrementally; the steps before it are shared with the slice above
+    model = pipeline[-1]
+    rng = np.random.default_rng(42)
+    for _ in range(TRAINING_EPOCHS):
+        order = rng.permutation(len(y))
+        model.partial_fit(X_scaled[order], y[order], sample_weight=weights[order])
+
+    predicted = np.clip(pipeline.predict(np.column_stack((hours, days))), 0, 100)
+    pipeline.residual_scale_, residual_rmse = residual_scale(predicted, count, total, total_sq)
+
+    metrics = {
+        'model_type': type(model).__name__,
+        'features': pipeline['features'].get_feature_names_out().tolist(),
+        'training_buckets': int(mask.sum()),
+        'score': round(float(model.score(X_scaled, y, sample_weight=weights)), 4),
+        'residual_rmse': round(residual_rmse, 4)
+    }
+    return pipeline, metrics
+
+
+def fit_keyed_models(stats, mappings):
+    """Fit one model per slot with enough history, and one per area pooling its slots"""
+    keyed = {}
+    for slot_id in stats.keys:
+        if slot_id == GLOBAL_KEY:
+            continue
+        count, total, total_sq = stats.buckets(slot_id)
+        if count.sum() >= MIN_KEYED_SAMPLES:
+            keyed[('slot', slot_id)] = fit_buckets(count, total, total_sq)
+
+    area_slots = {}
+    for slot_id, area in mappings['slot_area'].items():
+        area_slots.setdefault(area, []).append(slot_id)
+    for area, slot_ids in area_slots.items():
+        count, total, total_sq = stats.pooled(slot_ids)
+        if count.sum() >= MIN_KEYED_SAMPLES:
+            keyed[('area', area)] = fit_buckets(count, total, total_sq)
+
+    routing = {
+        'slot_area': mappings['slot_area'],
+        'zone_area': mappings['zone_area'],
+        'models': {
+            'slot': [key for kind, key in keyed if kind == 'slot'],
+            'area': [key for kind, key in keyed if kind == 'area']
+        }
+    }
+    return keyed, routing
+
+
+def fit_model(source=None):
+    """Fit the city-wide model plus any slot/area models the history supports
+
+    Returns (pipeline, metrics, keyed, routing); keyed and routing are empty
+    for synthetic data.
+    """
+    stats, source_name = load_training_stats(source)
+    count, total, total_sq = stats.buckets()
+    pipeline, metrics = fit_buckets(count, total, total_sq)
+    metrics['training_samples'] = stats.rows_seen
+    metrics['data_source'] = source_name
+
+    if source_name == 'synthetic':
+        keyed, routing = {}, None
+    else:
+        keyed, routing = fit_keyed_models(stats, load_area_mappings(source_name))
+    return pipeline, metrics, keyed, routing
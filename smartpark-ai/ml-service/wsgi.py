@@ -0,0 +1,6 @@
+"""WSGI entry point: gunicorn -c gunicorn.conf.py wsgi:app"""
+from app import MODEL_INIT, create_app
+
+# With MODEL_INIT=background nothing is loaded in the gunicorn master; each
+# worker starts loading after the fork (see post_fork in gunicorn.conf.py)
+app = create_app(preload=MODEL_INIT != 'background')